@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, status, Response
-from typing import List, Dict, Any
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Request
+from typing import List, Dict, Any, Tuple
 from app.models.event_models import (
     CameraConfig,
     CameraListResponse,
@@ -9,11 +10,41 @@ from app.services.video_worker import camera_manager
 from app.services.retention import retention_service
 from app.services.retention_scheduler import retention_scheduler
 from app.core.redis_client import redis_client
+from app.core.cache import cached_response, invalidate_cache, no_cache_headers
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-router = APIRouter(prefix="/api", tags=["cameras"])
+# Responses are uncacheable by default; cached endpoints return their own Cache-Control
+router = APIRouter(prefix="/api", tags=["cameras"], dependencies=[Depends(no_cache_headers)])
+
+# Cache namespaces for the polled GET endpoints
+CAMERAS_CACHE = "cameras"
+RETENTION_CACHE = "retention"
+
+# How long a last-known-good response is kept for backend outages
+STALE_TTL = 3600
+
+# Maximum number of cameras started concurrently by a single registration request
+MAX_CONCURRENT_REGISTRATIONS = 8
+
+
+def _try_add_camera(camera: CameraConfig) -> Tuple[bool, str]:
+    """
+    Add a camera, converting failures into a (success, reason) result.
+    
+    Args:
+        camera: Camera configuration
+        
+    Returns:
+        Tuple of (success, failure reason)
+    """
+    try:
+        if camera_manager.add_camera(camera):
+            return True, ""
+        return False, "Camera already exists or failed to start"
+    except Exception as e:
+        return False, str(e)
 
 
 @router.post("/cameras", status_code=status.HTTP_201_CREATED)
@@ -31,29 +62,33 @@ async def register_cameras(cameras: List[CameraConfig]) -> dict:
         "success": [],
         "failed": []
     }
-
-    for camera in cameras:
-        try:
-            if camera_manager.add_camera(camera):
-                results["success"].append({
-                    "camera_id": camera.camera_id,
-                    "camera_name": camera.camera_name
-                })
-                logger.info(f"Successfully registered camera: {camera.camera_id} ({camera.camera_name})")
-            else:
-                results["failed"].append({
-                    "camera_id": camera.camera_id,
-                    "camera_name": camera.camera_name,
-                    "reason": "Camera already exists or failed to start"
-                })
-                logger.warning(f"Failed to register camera: {camera.camera_id} ({camera.camera_name})")
-        except Exception as e:
+    
+    # Start cameras concurrently so stream opens and model loads overlap
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REGISTRATIONS)
+    
+    async def register(camera: CameraConfig) -> Tuple[bool, str]:
+        async with semaphore:
+            return await asyncio.to_thread(_try_add_camera, camera)
+    
+    outcomes = await asyncio.gather(*[register(camera) for camera in cameras])
+    
+    for camera, (success, reason) in zip(cameras, outcomes):
+        if success:
+            results["success"].append({
+                "camera_id": camera.camera_id,
+                "camera_name": camera.camera_name
+            })
+            logger.info(f"Successfully registered camera: {camera.camera_id} ({camera.camera_name})")
+        else:
             results["failed"].append({
                 "camera_id": camera.camera_id,
                 "camera_name": camera.camera_name,
-                "reason": str(e)
+                "reason": reason
             })
-            logger.error(f"Error registering camera {camera.camera_id} ({camera.camera_name}): {e}")
+            logger.warning(f"Failed to register camera {camera.camera_id} ({camera.camera_name}): {reason}")
+    
+    if results["success"]:
+        await asyncio.to_thread(invalidate_cache, CAMERAS_CACHE, RETENTION_CACHE)
     
     return {
         "message": f"Processed {len(cameras)} camera(s)",
@@ -62,18 +97,17 @@ async def register_cameras(cameras: List[CameraConfig]) -> dict:
 
 
 @router.get("/cameras", response_model=CameraListResponse)
-async def list_cameras(response: Response) -> CameraListResponse:
+@cached_response(CAMERAS_CACHE, expire=10, stale_expire=STALE_TTL)
+async def list_cameras(request: Request) -> CameraListResponse:
     """
     List all active cameras.
     
+    Args:
+        request: Incoming request (used for ETag/cache handling)
+        
     Returns:
         List of active camera configurations
     """
-    # Prevent caching to ensure fresh data
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
-    
     cameras_dict = camera_manager.list_cameras()
     cameras_list = list(cameras_dict.values())
     
@@ -86,7 +120,7 @@ async def list_cameras(response: Response) -> CameraListResponse:
 
 
 @router.get("/cameras/{camera_id}", response_model=CameraConfig)
-async def get_camera(camera_id: str, response: Response) -> CameraConfig:
+async def get_camera(camera_id: str) -> CameraConfig:
     """
     Get configuration for a specific camera.
     
@@ -99,9 +133,6 @@ async def get_camera(camera_id: str, response: Response) -> CameraConfig:
     Raises:
         HTTPException: If camera not found
     """
-    # Prevent caching
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
     camera = camera_manager.get_camera(camera_id)
     
     if not camera:
@@ -114,7 +145,7 @@ async def get_camera(camera_id: str, response: Response) -> CameraConfig:
 
 
 @router.delete("/cameras/{camera_id}", status_code=status.HTTP_200_OK)
-async def delete_camera(camera_id: str, response: Response) -> dict:
+async def delete_camera(camera_id: str) -> dict:
     """
     Stop processing and remove a camera.
     
@@ -127,20 +158,13 @@ async def delete_camera(camera_id: str, response: Response) -> dict:
     Raises:
         HTTPException: If camera not found
     """
-    # Prevent caching
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
     logger.info(f"Delete camera endpoint called for: {camera_id}")
     
-    # Get list of cameras before deletion for logging
-    cameras_before = list(camera_manager.list_cameras().keys())
-    logger.info(f"Cameras before deletion: {cameras_before}")
-    
     if camera_manager.remove_camera(camera_id):
-        # Get list of cameras after deletion for logging
+        await asyncio.to_thread(invalidate_cache, CAMERAS_CACHE, RETENTION_CACHE)
         cameras_after = list(camera_manager.list_cameras().keys())
         logger.info(f"Successfully deleted camera: {camera_id}")
-        logger.info(f"Cameras after deletion: {cameras_after}")
+        logger.debug(f"Cameras after deletion: {cameras_after}")
         
         return {
             "message": f"Camera {camera_id} stopped and removed successfully",
@@ -148,7 +172,7 @@ async def delete_camera(camera_id: str, response: Response) -> dict:
         }
     else:
         logger.error(f"Failed to delete camera: {camera_id} - camera not found")
-        logger.info(f"Available cameras: {cameras_before}")
+        logger.debug(f"Available cameras: {list(camera_manager.list_cameras().keys())}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Camera {camera_id} not found"
@@ -156,20 +180,29 @@ async def delete_camera(camera_id: str, response: Response) -> dict:
 
 
 @router.get("/health", response_model=HealthResponse)
+@cached_response(CAMERAS_CACHE, expire=5, stale_expire=STALE_TTL)
 async def health_check() -> HealthResponse:
     """
     Health check endpoint.
     
     Returns:
         Health status of the service
+        
+    Raises:
+        HTTPException: 503 if Redis is unreachable, so the degraded status is
+            never cached (the last healthy response may be served instead)
     """
     redis_connected = redis_client.health_check()
     active_cameras = len(camera_manager.list_cameras())
     
-    service_status = "healthy" if redis_connected else "degraded"
+    if not redis_connected:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service degraded: Redis is not connected"
+        )
     
     return HealthResponse(
-        status=service_status,
+        status="healthy",
         redis_connected=redis_connected,
         active_cameras=active_cameras
     )
@@ -178,16 +211,14 @@ async def health_check() -> HealthResponse:
 # Retention Management Endpoints
 
 @router.get("/retention/stats")
-async def get_retention_stats(response: Response) -> Dict[str, Any]:
+@cached_response(RETENTION_CACHE, expire=30, stale_expire=STALE_TTL)
+async def get_retention_stats() -> Dict[str, Any]:
     """
     Get retention statistics for all cameras.
     
     Returns:
         Dictionary with retention statistics per camera
     """
-    # Prevent caching
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
     try:
         camera_configs = camera_manager.list_cameras()
         stats = retention_service.get_retention_stats(camera_configs)
@@ -207,26 +238,30 @@ async def get_retention_stats(response: Response) -> Dict[str, Any]:
 
 
 @router.post("/retention/cleanup")
-async def trigger_retention_cleanup(response: Response) -> Dict[str, Any]:
+async def trigger_retention_cleanup() -> Dict[str, Any]:
     """
     Manually trigger retention cleanup for all cameras.
     
     Returns:
         Dictionary with cleanup results
     """
-    # Prevent caching
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
     try:
         logger.info("Manual retention cleanup triggered via API")
         results = retention_scheduler.run_cleanup_now()
         
+        if results.get("skipped"):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=results["message"]
+            )
+        
         if "error" in results:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=results["error"]
             )
         
+        await asyncio.to_thread(invalidate_cache, RETENTION_CACHE)
         logger.info("Manual retention cleanup completed successfully")
         return results
         
@@ -241,7 +276,7 @@ async def trigger_retention_cleanup(response: Response) -> Dict[str, Any]:
 
 
 @router.post("/retention/cleanup/{camera_id}")
-async def trigger_camera_cleanup(camera_id: str, response: Response) -> Dict[str, Any]:
+async def trigger_camera_cleanup(camera_id: str) -> Dict[str, Any]:
     """
     Manually trigger retention cleanup for a specific camera.
     
@@ -254,9 +289,6 @@ async def trigger_camera_cleanup(camera_id: str, response: Response) -> Dict[str
     Raises:
         HTTPException: If camera not found
     """
-    # Prevent caching
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
     try:
         # Check if camera exists
         camera = camera_manager.get_camera(camera_id)
@@ -268,12 +300,16 @@ async def trigger_camera_cleanup(camera_id: str, response: Response) -> Dict[str
         
         logger.info(f"Manual retention cleanup triggered for camera {camera_id}")
         
-        # Run cleanup for specific camera
-        deleted_events, deleted_snapshots = retention_service.cleanup_events_for_camera(
-            camera_id, 
-            camera.parameters.retention_days
-        )
+        # Run cleanup for specific camera, serialized with scheduled and full cleanups
+        result = retention_scheduler.run_camera_cleanup_now(camera_id, camera.parameters.retention_days)
+        if result is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Retention cleanup already running"
+            )
+        deleted_events, deleted_snapshots = result
         
+        await asyncio.to_thread(invalidate_cache, RETENTION_CACHE)
         logger.info(f"Manual cleanup completed for camera {camera_id}: {deleted_events} events, {deleted_snapshots} snapshots deleted")
         
         return {
@@ -295,16 +331,14 @@ async def trigger_camera_cleanup(camera_id: str, response: Response) -> Dict[str
 
 
 @router.get("/retention/scheduler/status")
-async def get_scheduler_status(response: Response) -> Dict[str, Any]:
+@cached_response(RETENTION_CACHE, expire=15)
+async def get_scheduler_status() -> Dict[str, Any]:
     """
     Get retention scheduler status.
     
     Returns:
         Dictionary with scheduler status information
     """
-    # Prevent caching
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
     try:
         status_info = retention_scheduler.get_status()
         return {
@@ -320,18 +354,16 @@ async def get_scheduler_status(response: Response) -> Dict[str, Any]:
 
 
 @router.post("/retention/scheduler/start")
-async def start_retention_scheduler(response: Response) -> Dict[str, Any]:
+async def start_retention_scheduler() -> Dict[str, Any]:
     """
     Start the retention scheduler.
     
     Returns:
         Status message
     """
-    # Prevent caching
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
     try:
         retention_scheduler.start()
+        await asyncio.to_thread(invalidate_cache, RETENTION_CACHE)
         logger.info("Retention scheduler started via API")
         
         return {
@@ -347,18 +379,16 @@ async def start_retention_scheduler(response: Response) -> Dict[str, Any]:
 
 
 @router.post("/retention/scheduler/stop")
-async def stop_retention_scheduler(response: Response) -> Dict[str, Any]:
+async def stop_retention_scheduler() -> Dict[str, Any]:
     """
     Stop the retention scheduler.
     
     Returns:
         Status message
     """
-    # Prevent caching
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
     try:
         retention_scheduler.stop()
+        await asyncio.to_thread(invalidate_cache, RETENTION_CACHE)
         logger.info("Retention scheduler stopped via API")
         
         return {
@@ -1,24 +1,46 @@
 """
 Events API endpoints for fetching event data and snapshots.
 """
-from fastapi import APIRouter, HTTPException, status, Query, Depends
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, cast, String, func, text
+import asyncio
+import mimetypes
+import re
+from fastapi import APIRouter, HTTPException, status, Query, Depends, Request
+from fastapi.responses import FileResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, text, select, delete
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel, Field
 
 from app.models.db_models import EventRecord
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.utils.snapshot import snapshot_manager
 from app.utils.logger import get_logger
 from app.core.redis_client import redis_client
+from app.core.config import get_settings
+from app.core.cache import (
+    cached_response,
+    bump_version,
+    get_latest_events,
+    clear_latest_events,
+    EVENTS_VERSION_KEY
+)
 
 logger = get_logger(__name__)
+settings = get_settings()
 
 router = APIRouter(prefix="/api/events", tags=["events"])
 
+# Maximum number of snapshot files unlinked concurrently by a bulk delete
+MAX_CONCURRENT_UNLINKS = 32
+
+# Cache namespace for event list pages
+EVENTS_CACHE = "events"
+
+# License plate searches without regex metacharacters are plain substring
+# matches and can use the pg_trgm index through ILIKE
+PLAIN_PLATE_PATTERN = re.compile(r"^[A-Za-z0-9 -]+$")
+
 
 # Response models
 class EventResponse(BaseModel):
@@ -36,17 +58,30 @@ class EventResponse(BaseModel):
     created_at: datetime
 
 
+# Columns selected for event listings; rows come back as plain mappings,
+# skipping ORM identity map and attribute tracking
+EVENT_RESPONSE_COLUMNS = tuple(EventRecord.__table__.c[name] for name in EventResponse.model_fields)
+
+
 class EventListResponse(BaseModel):
     """Event list response with pagination."""
     model_config = {"protected_namespaces": ()}
     
     events: List[EventResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
     has_more: bool
 
 
+class BulkDeleteRequest(BaseModel):
+    """Bulk event deletion request."""
+    model_config = {"protected_namespaces": ()}
+    
+    ids: List[int] = Field(..., min_length=1, max_length=1000, description="IDs of events to delete")
+    delete_snapshot: bool = Field(False, description="Also delete associated snapshot files")
+
+
 class EventStatsResponse(BaseModel):
     """Event statistics response."""
     model_config = {"protected_namespaces": ()}
@@ -57,21 +92,59 @@ class EventStatsResponse(BaseModel):
     date_range: dict
 
 
+def _to_db_timestamp(value: datetime) -> datetime:
+    """
+    Normalize a query timestamp for the timestamptz column.
+    
+    Naive inputs are taken to be UTC, matching how events have always been
+    stamped, rather than the database session's time zone.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
 def convert_event_record_to_response(event_record: EventRecord) -> EventResponse:
     """
     Convert EventRecord database model to EventResponse format.
     
+    Rows come from our own schema, so validation is skipped.
+    
     Args:
         event_record: EventRecord from database
         
     Returns:
         EventResponse object
     """
-    return EventResponse.model_validate(event_record)
+    return EventResponse.model_construct(
+        **{name: getattr(event_record, name) for name in EventResponse.model_fields}
+    )
+
+
+def _ring_event_to_response(event: dict) -> EventResponse:
+    """
+    Convert a latest-events ring payload to EventResponse format.
+    
+    Payloads were built from saved rows, so validation is skipped; only the
+    ISO timestamps are parsed back into datetimes.
+    
+    Args:
+        event: Event payload read from the ring
+        
+    Returns:
+        EventResponse object
+    """
+    return EventResponse.model_construct(**{
+        **event,
+        "timestamp": datetime.fromisoformat(event["timestamp"].replace('Z', '+00:00')),
+        "created_at": datetime.fromisoformat(event["created_at"].replace('Z', '+00:00'))
+    })
 
 
 @router.get("", response_model=EventListResponse)
+@cached_response(EVENTS_CACHE, expire=10, version_key=EVENTS_VERSION_KEY)
 async def list_events(
+    request: Request,
     camera_id: Optional[str] = Query(None, description="Filter by camera ID"),
     event_type: Optional[str] = Query(None, description="Filter by event type (detection, motion, anpr, tracking)"),
     object_class: Optional[str] = Query(None, description="Filter by object class (e.g., person, car, truck, garbage)"),
@@ -81,12 +154,17 @@ async def list_events(
     end_time: Optional[datetime] = Query(None, description="End timestamp (ISO format)"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=500, description="Items per page"),
-    db: Session = Depends(get_db)
+    include_total: bool = Query(False, description="Also return the total number of matching events (slower on large tables)"),
+    db: AsyncSession = Depends(get_async_db)
 ) -> EventListResponse:
     """
     List events with filtering and pagination.
     
+    Pages are cached in Redis for a few seconds and invalidated whenever
+    events are written or deleted; send `Cache-Control: no-cache` to bypass.
+    
     Args:
+        request: Incoming request (used for ETag/cache handling)
         camera_id: Filter by camera ID
         event_type: Filter by event type
         object_class: Filter by object class (e.g., person, car, truck, garbage)
@@ -98,6 +176,7 @@ async def list_events(
         end_time: End timestamp for filtering
         page: Page number (1-indexed)
         page_size: Number of items per page
+        include_total: Whether to compute the total number of matching events
         db: Database session
         
     Returns:
@@ -107,9 +186,6 @@ async def list_events(
         # Debug log to verify code version
         logger.info("DEBUG: Executing list_events with JSONB cast fix")
         
-        # Build query
-        query = db.query(EventRecord)
-        
         # Apply filters
         filters = []
         if camera_id:
@@ -117,65 +193,88 @@ async def list_events(
         if event_type:
             filters.append(EventRecord.event_type == event_type)
         if object_class:
-            # Filter by class_name in the event_data JSON field (case-insensitive using ILIKE)
+            # Filter by the generated class_name column (lowercased event_data->>'class_name')
             logger.info(f"Adding object_class filter: '{object_class}'")
-            filters.append(text("LOWER(event_data->>'class_name') = LOWER(:object_class)").bindparams(object_class=object_class))
+            filters.append(EventRecord.class_name == object_class.lower())
         if license_plate:
-            # Complex regex-based search for license plates
-            # This searches in event_data->anpr_result->license_plate using PostgreSQL regex matching
-            # Supports partial matches and regex patterns
             logger.info(f"Adding license_plate filter with pattern: '{license_plate}'")
-            # Use ~* for case-insensitive regex match in PostgreSQL
-            # Handle null anpr_result gracefully
-            filters.append(
-                text("event_data->'anpr_result'->>'license_plate' IS NOT NULL AND event_data->'anpr_result'->>'license_plate' ~* :license_pattern")
-                .bindparams(license_pattern=license_plate)
-            )
+            if PLAIN_PLATE_PATTERN.match(license_plate):
+                # Plain substring search: ILIKE is served by the idx_license_plate_trgm GIN index
+                filters.append(
+                    text("event_data->'anpr_result'->>'license_plate' ILIKE :license_pattern")
+                    .bindparams(license_pattern=f"%{license_plate}%")
+                )
+            else:
+                # Complex regex-based search for license plates
+                # Use ~* for case-insensitive regex match in PostgreSQL
+                # Handle null anpr_result gracefully
+                filters.append(
+                    text("event_data->'anpr_result'->>'license_plate' IS NOT NULL AND event_data->'anpr_result'->>'license_plate' ~* :license_pattern")
+                    .bindparams(license_pattern=license_plate)
+                )
         if min_confidence is not None:
-            # Confidence filtering works differently for different event types:
-            # - Tracking: event_data->>'confidence' >= min_confidence
-            # - ANPR: event_data->'anpr_result'->>'confidence' >= min_confidence
-            # - Detection: Check if any detection in event_data->'detections' array has confidence >= min_confidence
-            # - Motion: No confidence field, so exclude motion events when confidence filter is applied
+            # max_confidence is generated from event_data: the tracking confidence, the ANPR
+            # confidence or the best detection confidence. Motion events have none (NULL),
+            # so they are excluded when a confidence filter is applied.
             logger.info(f"Adding min_confidence filter: {min_confidence}")
-            confidence_filter = text("""
-                (
-                    -- For tracking events: check direct confidence field
-                    (event_type = 'tracking' AND (event_data->>'confidence')::float >= :min_conf)
-                    OR
-                    -- For ANPR events: check nested confidence in anpr_result
-                    (event_type = 'anpr' AND (event_data->'anpr_result'->>'confidence')::float >= :min_conf)
-                    OR
-                    -- For detection events: check if any detection has confidence >= threshold
-                    (event_type = 'detection' AND EXISTS (
-                        SELECT 1 FROM jsonb_array_elements((event_data->'detections')::jsonb) AS det
-                        WHERE (det->>'confidence')::float >= :min_conf
-                    ))
-                )
-            """).bindparams(min_conf=min_confidence)
-            filters.append(confidence_filter)
+            filters.append(EventRecord.max_confidence >= min_confidence)
         if start_time:
-            filters.append(EventRecord.timestamp >= start_time)
+            filters.append(EventRecord.timestamp >= _to_db_timestamp(start_time))
         if end_time:
-            filters.append(EventRecord.timestamp <= end_time)
-        
-        if filters:
-            logger.info(f"Applying {len(filters)} filters to query")
-            query = query.filter(and_(*filters))
+            filters.append(EventRecord.timestamp <= _to_db_timestamp(end_time))
+        
+        # Hottest path (unfiltered first page): serve from the latest-events ring
+        # when it holds more than a page, so has_more is known without the DB.
+        # The ring is in insertion order; re-sort it by timestamp like the DB path
+        # so a late-arriving event doesn't put page 1 out of step with page 2.
+        if not filters and page == 1 and not include_total:
+            latest = get_latest_events(page_size + 1)
+            if len(latest) > page_size:
+                latest = sorted(
+                    (_ring_event_to_response(event) for event in latest),
+                    key=lambda event: event.timestamp,
+                    reverse=True
+                )
+                return EventListResponse(
+                    events=latest[:page_size],
+                    page=page,
+                    page_size=page_size,
+                    has_more=True
+                )
         
-        # Get total count
         logger.info(f"Executing query with filters: {[str(f) for f in filters]}")
-        total = query.count()
         
-        # Apply pagination and ordering
+        # The total is only computed on request, as a window over the same
+        # scan, instead of a separate COUNT(*) pass
+        columns = list(EVENT_RESPONSE_COLUMNS)
+        if include_total:
+            columns.append(func.count().over().label("total_count"))
+        
+        # Apply pagination and ordering; one extra row tells us whether there is a next page
         offset = (page - 1) * page_size
-        events = query.order_by(desc(EventRecord.timestamp)).offset(offset).limit(page_size).all()
+        stmt = (
+            select(*columns)
+            .where(*filters)
+            .order_by(desc(EventRecord.timestamp))
+            .offset(offset)
+            .limit(page_size + 1)
+        )
+        rows = (await db.execute(stmt)).mappings().all()
+        
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
         
-        # Check if there are more pages
-        has_more = (offset + page_size) < total
+        total = None
+        if include_total:
+            if rows:
+                total = rows[0]["total_count"]
+            else:
+                # Page past the end: the window never ran, fall back to a plain count
+                total = await db.scalar(select(func.count(EventRecord.id)).where(*filters))
         
         return EventListResponse(
-            events=[EventResponse.model_validate(event) for event in events],
+            # Trusted DB rows: construct without validation (extra keys such as total_count are dropped)
+            events=[EventResponse.model_construct(**row) for row in rows],
             total=total,
             page=page,
             page_size=page_size,
@@ -190,17 +289,20 @@ async def list_events(
 
 
 @router.get("/stats", response_model=EventStatsResponse)
+@cached_response(EVENTS_CACHE, expire=10, version_key=EVENTS_VERSION_KEY)
 async def get_event_stats(
+    request: Request,
     camera_id: Optional[str] = Query(None, description="Filter by camera ID"),
     object_class: Optional[str] = Query(None, description="Filter by object class (e.g., person, car, truck, garbage)"),
     start_time: Optional[datetime] = Query(None, description="Start timestamp (ISO format)"),
     end_time: Optional[datetime] = Query(None, description="End timestamp (ISO format)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> EventStatsResponse:
     """
     Get event statistics.
     
     Args:
+        request: Incoming request (used for ETag/cache handling)
         camera_id: Filter by camera ID
         object_class: Filter by object class (e.g., person, car, truck, garbage)
         start_time: Start timestamp for filtering
@@ -211,69 +313,57 @@ async def get_event_stats(
         Event statistics
     """
     try:
-        # Build query
-        query = db.query(EventRecord)
-        
         # Apply filters
         filters = []
         if camera_id:
             filters.append(EventRecord.camera_id == camera_id)
         if object_class:
-            # Filter by class_name in the event_data JSON field (case-insensitive using ILIKE)
+            # Filter by the generated class_name column (lowercased event_data->>'class_name')
             logger.info(f"Adding object_class filter: '{object_class}'")
-            filters.append(text("LOWER(event_data->>'class_name') = LOWER(:object_class)").bindparams(object_class=object_class))
+            filters.append(EventRecord.class_name == object_class.lower())
         if start_time:
-            filters.append(EventRecord.timestamp >= start_time)
+            filters.append(EventRecord.timestamp >= _to_db_timestamp(start_time))
         if end_time:
-            filters.append(EventRecord.timestamp <= end_time)
-        
-        if filters:
-            query = query.filter(and_(*filters))
+            filters.append(EventRecord.timestamp <= _to_db_timestamp(end_time))
+        
+        # Get events by type in a single grouped query
+        type_counts = (await db.execute(
+            select(EventRecord.event_type, func.count().label("count"))
+            .where(*filters)
+            .group_by(EventRecord.event_type)
+        )).all()
+        
+        events_by_type = {event_type: 0 for event_type in ["detection", "motion", "anpr", "tracking"]}
+        total_events = 0
+        for event_type, count in type_counts:
+            total_events += count
+            if event_type in events_by_type:
+                events_by_type[event_type] = count
+        
+        # Get events by camera; max() skips NULL names so a known camera_name wins
+        camera_counts = (await db.execute(
+            select(EventRecord.camera_id, func.max(EventRecord.camera_name), func.count())
+            .where(*filters)
+            .group_by(EventRecord.camera_id)
+        )).all()
         
-        # Get total count
-        total_events = query.count()
-        
-        # Get events by type
-        events_by_type = {}
-        for event_type in ["detection", "motion", "anpr", "tracking"]:
-            count = query.filter(EventRecord.event_type == event_type).count()
-            events_by_type[event_type] = count
-        
-        # Get events by camera
         events_by_camera = {}
-        # Group by camera_id and get the most recent camera_name for each camera
-        camera_data = db.query(
-            EventRecord.camera_id,
-            EventRecord.camera_name
-        ).distinct().all()
-        
-        # Create a mapping of camera_id to the most appropriate camera_name
-        camera_name_map = {}
-        for (cam_id, cam_name) in camera_data:
-            if cam_id not in camera_name_map:
-                # Prefer non-null camera names, but keep track of all options
-                camera_name_map[cam_id] = cam_name
-            elif cam_name and not camera_name_map[cam_id]:
-                # Update to non-null name if we had null before
-                camera_name_map[cam_id] = cam_name
-        
-        # Count events for each camera using the mapped names
-        for cam_id in camera_name_map.keys():
-            if camera_id is None or cam_id == camera_id:
-                count = query.filter(EventRecord.camera_id == cam_id).count()
-                # Use camera name if available, otherwise fall back to camera ID
-                display_name = camera_name_map[cam_id] if camera_name_map[cam_id] else cam_id
-                events_by_camera[display_name] = count
+        for cam_id, cam_name, count in camera_counts:
+            # Use camera name if available, otherwise fall back to camera ID
+            display_name = cam_name if cam_name else cam_id
+            events_by_camera[display_name] = count
         
         # Get date range
-        first_event = query.order_by(EventRecord.timestamp.asc()).first()
-        last_event = query.order_by(EventRecord.timestamp.desc()).first()
+        first_timestamp, last_timestamp = (await db.execute(
+            select(func.min(EventRecord.timestamp), func.max(EventRecord.timestamp))
+            .where(*filters)
+        )).one()
         
         date_range = {}
-        if first_event and last_event:
+        if first_timestamp and last_timestamp:
             date_range = {
-                "first_event": first_event.timestamp.isoformat(),
-                "last_event": last_event.timestamp.isoformat()
+                "first_event": first_timestamp.isoformat(),
+                "last_event": last_timestamp.isoformat()
             }
         
         return EventStatsResponse(
@@ -293,7 +383,7 @@ async def get_event_stats(
 @router.get("/{event_id}", response_model=EventResponse)
 async def get_event(
     event_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> EventResponse:
     """
     Get a specific event by ID.
@@ -309,7 +399,7 @@ async def get_event(
         HTTPException: If event not found
     """
     try:
-        event = db.query(EventRecord).filter(EventRecord.id == event_id).first()
+        event = await db.get(EventRecord, event_id)
         
         if not event:
             raise HTTPException(
@@ -317,7 +407,7 @@ async def get_event(
                 detail=f"Event {event_id} not found"
             )
         
-        return EventResponse.model_validate(event)
+        return convert_event_record_to_response(event)
     except HTTPException:
         raise
     except Exception as e:
@@ -331,7 +421,7 @@ async def get_event(
 @router.get("/{event_id}/snapshot")
 async def get_event_snapshot(
     event_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get snapshot image for a specific event.
@@ -347,7 +437,7 @@ async def get_event_snapshot(
         HTTPException: If event not found or no snapshot available
     """
     try:
-        event = db.query(EventRecord).filter(EventRecord.id == event_id).first()
+        event = await db.get(EventRecord, event_id)
         
         if not event:
             raise HTTPException(
@@ -361,6 +451,16 @@ async def get_event_snapshot(
                 detail=f"No snapshot available for event {event_id}"
             )
         
+        # Let nginx serve the file (sendfile + Range support) when configured
+        if settings.snapshot_xaccel_prefix:
+            media_type = mimetypes.guess_type(event.snapshot_path)[0] or "application/octet-stream"
+            return Response(
+                media_type=media_type,
+                headers={
+                    "X-Accel-Redirect": f"{settings.snapshot_xaccel_prefix.rstrip('/')}/{event.snapshot_path}"
+                }
+            )
+        
         # Get full path to snapshot
         snapshot_full_path = snapshot_manager.get_snapshot_full_path(event.snapshot_path)
         
@@ -390,7 +490,7 @@ async def get_event_snapshot(
 async def delete_event(
     event_id: int,
     delete_snapshot: bool = Query(False, description="Also delete associated snapshot file"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> dict:
     """
     Delete a specific event.
@@ -407,40 +507,94 @@ async def delete_event(
         HTTPException: If event not found
     """
     try:
-        event = db.query(EventRecord).filter(EventRecord.id == event_id).first()
-        
-        if not event:
+        # Delete event from database and get its snapshot path in one round trip
+        deleted = (await db.execute(
+            delete(EventRecord)
+            .where(EventRecord.id == event_id)
+            .returning(EventRecord.snapshot_path)
+        )).first()
+        
+        if deleted is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Event {event_id} not found"
             )
         
-        # Delete snapshot file if requested
-        if delete_snapshot and event.snapshot_path:
-            try:
-                snapshot_full_path = snapshot_manager.get_snapshot_full_path(event.snapshot_path)
-                if snapshot_full_path.exists():
-                    snapshot_full_path.unlink()
-                    logger.info(f"Deleted snapshot file: {snapshot_full_path}")
-            except Exception as e:
-                logger.error(f"Failed to delete snapshot file: {e}", exc_info=True)
+        snapshot_path = deleted.snapshot_path
+        await db.commit()
+        # Blocking Redis calls, kept off the event loop
+        await asyncio.to_thread(bump_version, EVENTS_VERSION_KEY)
+        await asyncio.to_thread(clear_latest_events)
         
-        # Delete event from database
-        db.delete(event)
-        db.commit()
+        # Delete snapshot file if requested (off the event loop)
+        if delete_snapshot and snapshot_path:
+            await asyncio.to_thread(snapshot_manager.delete_snapshot, snapshot_path)
         
         logger.info(f"Deleted event {event_id}")
         return {
             "message": f"Event {event_id} deleted successfully",
-            "snapshot_deleted": delete_snapshot and event.snapshot_path is not None
+            "snapshot_deleted": delete_snapshot and snapshot_path is not None
         }
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error deleting event {event_id}: {e}", exc_info=True)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete event: {str(e)}"
         )
 
+
+@router.post("/bulk_delete", status_code=status.HTTP_200_OK)
+async def bulk_delete_events(
+    request: BulkDeleteRequest,
+    db: AsyncSession = Depends(get_async_db)
+) -> dict:
+    """
+    Delete many events in a single statement.
+    
+    Args:
+        request: Event IDs and whether to delete their snapshot files
+        db: Database session
+        
+    Returns:
+        Number of deleted events and snapshots
+    """
+    try:
+        # Delete events and get their snapshot paths in one round trip
+        deleted_paths = (await db.scalars(
+            delete(EventRecord)
+            .where(EventRecord.id.in_(request.ids))
+            .returning(EventRecord.snapshot_path)
+        )).all()
+        deleted_events = len(deleted_paths)
+        snapshot_paths = [path for path in deleted_paths if path] if request.delete_snapshot else []
+        await db.commit()
+        # Blocking Redis calls, kept off the event loop
+        await asyncio.to_thread(bump_version, EVENTS_VERSION_KEY)
+        await asyncio.to_thread(clear_latest_events)
+        
+        # Unlink snapshot files concurrently, bounded to avoid flooding the thread pool
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_UNLINKS)
+        
+        async def unlink(path: str) -> bool:
+            async with semaphore:
+                return await asyncio.to_thread(snapshot_manager.delete_snapshot, path)
+        
+        unlinked = await asyncio.gather(*[unlink(path) for path in snapshot_paths])
+        deleted_snapshots = sum(1 for ok in unlinked if ok)
+        
+        logger.info(f"Bulk deleted {deleted_events} events and {deleted_snapshots} snapshots")
+        return {
+            "message": f"Deleted {deleted_events} event(s)",
+            "deleted_events": deleted_events,
+            "deleted_snapshots": deleted_snapshots
+        }
+    except Exception as e:
+        logger.error(f"Error bulk deleting events: {e}", exc_info=True)
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete events: {str(e)}"
+        )
@@ -0,0 +1,306 @@
+"""
+Redis-backed response caching for frequently polled API endpoints.
+"""
+import asyncio
+import hashlib
+from datetime import date, datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.core.redis_client import redis_client
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Prefix shared by every cached response key
+CACHE_PREFIX = "vyset"
+
+# Prefix for last-known-good copies served while a backend is failing.
+# Kept outside the namespace pattern so invalidation never drops them.
+STALE_PREFIX = f"{CACHE_PREFIX}:stale"
+
+# Counter bumped on every event insert/delete; part of the event list cache keys
+EVENTS_VERSION_KEY = f"{CACHE_PREFIX}:version:events"
+
+# Ring of the most recent events (newest first), serving the unfiltered first page
+LATEST_EVENTS_KEY = f"{CACHE_PREFIX}:latest:events"
+LATEST_EVENTS_SIZE = 1000
+
+
+def _build_cache_key(namespace: str, func: Callable, kwargs: Dict[str, Any],
+                     version: Optional[bytes] = None) -> str:
+    """
+    Build a cache key from the endpoint name and its path/query parameters.
+
+    Injected objects (Request, Response, sessions) are ignored so that only
+    the parameters that shape the response take part in the key.
+    """
+    params = sorted(
+        (name, value) for name, value in kwargs.items()
+        if value is None or isinstance(value, (str, int, float, bool, date, datetime))
+    )
+    digest = hashlib.blake2b(repr((params, version)).encode(), digest_size=8).hexdigest()
+    return f"{CACHE_PREFIX}:{namespace}:{func.__name__}:{digest}"
+
+
+async def no_cache_headers(response: Response):
+    """
+    Router dependency marking responses as uncacheable by clients.
+
+    Endpoints that return their own Response (such as cached_response hits,
+    misses and 304s) are unaffected, since FastAPI only applies these
+    headers to responses it builds itself.
+    """
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+
+
+def _find_request(kwargs: Dict[str, Any]) -> Optional[Request]:
+    """Return the endpoint's Request parameter, if it declares one."""
+    for value in kwargs.values():
+        if isinstance(value, Request):
+            return value
+    return None
+
+
+def _bypasses_cache(request: Optional[Request]) -> bool:
+    """Check whether the client asked for a fresh response with Cache-Control: no-cache."""
+    return request is not None and "no-cache" in request.headers.get("cache-control", "").lower()
+
+
+def _body_etag(body) -> str:
+    """Build a strong ETag from a serialized response body."""
+    if isinstance(body, str):
+        body = body.encode()
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _not_modified(request: Optional[Request], etag: str, expire: int) -> Optional[Response]:
+    """Return a 304 response if the client already holds the representation tagged `etag`."""
+    if request is None:
+        return None
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": f"private, max-age={expire}"})
+    return None
+
+
+def _serialize(result: Any) -> bytes:
+    """
+    Serialize an endpoint result to JSON with orjson.
+
+    Pydantic models are dumped to Python objects first (orjson handles
+    datetimes and numpy values natively); anything else orjson does not know
+    falls back to FastAPI's jsonable_encoder.
+    """
+    if isinstance(result, BaseModel):
+        result = result.model_dump()
+    return orjson.dumps(result, default=jsonable_encoder, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _cached_json_response(body: bytes, expire: int, etag: str, stale: bool = False) -> Response:
+    """Wrap a serialized JSON body in a response that clients may cache for `expire` seconds."""
+    headers = {"Cache-Control": f"private, max-age={expire}", "ETag": etag}
+    if stale:
+        headers["X-Served-Stale"] = "1"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def get_cached(key: str) -> Optional[bytes]:
+    """
+    Read a cached value, treating Redis errors as a cache miss.
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Cached bytes, or None on miss or error
+    """
+    try:
+        return redis_client.client.get(key)
+    except Exception as e:
+        logger.warning(f"Cache read failed for {key}: {e}")
+        return None
+
+
+def set_cached(key: str, value: bytes, expire: int,
+               stale_key: Optional[str] = None, stale_expire: Optional[int] = None):
+    """
+    Store a value in the cache, ignoring Redis errors.
+
+    Args:
+        key: Cache key
+        value: Serialized value
+        expire: Time-to-live in seconds
+        stale_key: Optional key for a long-lived fallback copy
+        stale_expire: Time-to-live of the fallback copy in seconds
+    """
+    try:
+        pipe = redis_client.client.pipeline(transaction=False)
+        pipe.set(key, value, ex=expire)
+        if stale_key and stale_expire:
+            pipe.set(stale_key, value, ex=stale_expire)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Cache write failed for {key}: {e}")
+
+
+def bump_version(key: str):
+    """
+    Increment a cache version counter, implicitly invalidating every key built from it.
+
+    Args:
+        key: Version counter key
+    """
+    try:
+        redis_client.client.incr(key)
+    except Exception as e:
+        logger.warning(f"Cache version bump failed for {key}: {e}")
+
+
+def push_latest_events(events: List[Union[Dict[str, Any], bytes]]):
+    """
+    Prepend events to the latest-events ring, trimming it to LATEST_EVENTS_SIZE.
+
+    Args:
+        events: Event payloads in EventResponse shape (or their serialized bytes), oldest first
+    """
+    if not events:
+        return
+    try:
+        pipe = redis_client.client.pipeline(transaction=False)
+        pipe.lpush(LATEST_EVENTS_KEY, *[
+            event if isinstance(event, bytes) else orjson.dumps(event) for event in events
+        ])
+        pipe.ltrim(LATEST_EVENTS_KEY, 0, LATEST_EVENTS_SIZE - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to push event to latest-events ring: {e}")
+
+
+def get_latest_events(count: int) -> List[Dict[str, Any]]:
+    """
+    Read up to `count` of the most recent events from the ring.
+
+    Args:
+        count: Maximum number of events
+
+    Returns:
+        Events, newest first (empty on error)
+    """
+    try:
+        return [orjson.loads(item) for item in redis_client.client.lrange(LATEST_EVENTS_KEY, 0, count - 1)]
+    except Exception as e:
+        logger.warning(f"Failed to read latest-events ring: {e}")
+        return []
+
+
+def clear_latest_events():
+    """Drop the latest-events ring after deletions; it refills as new events arrive."""
+    try:
+        redis_client.client.delete(LATEST_EVENTS_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to clear latest-events ring: {e}")
+
+
+def cached_response(namespace: str, expire: int, stale_expire: Optional[int] = None,
+                    version_key: Optional[str] = None):
+    """
+    Cache the JSON response of an async endpoint in Redis.
+
+    The endpoint only runs on a cache miss; hits are served straight from a
+    single Redis GET. Error responses (raised HTTPExceptions) are never cached.
+
+    When `stale_expire` is set, a second long-lived copy of every successful
+    response is kept. If the endpoint later fails with an unexpected error
+    or a 5xx, that copy is returned with an `X-Served-Stale: 1` header
+    instead of the error.
+
+    When `version_key` is set, the current value of that counter is part of
+    the cache key, so bumping it invalidates every cached page at once.
+
+    Responses carry an ETag: the versioned cache key when a version counter
+    is available, otherwise a hash of the body. If the request's
+    If-None-Match matches, a bodyless 304 is returned; with a version
+    counter this happens before any cache or database lookup. Requests sent
+    with `Cache-Control: no-cache` skip the cache lookup. Both features need
+    the endpoint to declare a `Request` parameter.
+
+    Redis is reached through the synchronous client, so every cache call is
+    run in a worker thread to keep the event loop free for other requests.
+
+    Args:
+        namespace: Cache namespace, used for invalidation
+        expire: Time-to-live in seconds
+        stale_expire: Time-to-live of the fallback copy in seconds (disabled if None)
+        version_key: Optional version counter key mixed into the cache key
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = _find_request(kwargs)
+            version = await asyncio.to_thread(get_cached, version_key) if version_key else None
+            key = _build_cache_key(namespace, func, kwargs, version)
+            stale_key = key.replace(CACHE_PREFIX, STALE_PREFIX, 1) if stale_expire else None
+
+            # With a version counter the key itself identifies the representation
+            etag = f'"{key.rsplit(":", 1)[1]}"' if version is not None else None
+            if etag:
+                not_modified = _not_modified(request, etag, expire)
+                if not_modified is not None:
+                    return not_modified
+
+            if not _bypasses_cache(request):
+                cached = await asyncio.to_thread(get_cached, key)
+                if cached is not None:
+                    cached_etag = etag or _body_etag(cached)
+                    return _not_modified(request, cached_etag, expire) or \
+                        _cached_json_response(cached, expire, cached_etag)
+
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if stale_key is None or (isinstance(e, HTTPException) and e.status_code < 500):
+                    raise
+                stale = await asyncio.to_thread(get_cached, stale_key)
+                if stale is None:
+                    raise
+                logger.warning(f"Serving stale response for {func.__name__} after error: {e}")
+                return _cached_json_response(stale, expire, _body_etag(stale), stale=True)
+
+            if isinstance(result, Response):
+                return result
+
+            body = _serialize(result)
+            await asyncio.to_thread(set_cached, key, body, expire, stale_key, stale_expire)
+            body_etag = etag or _body_etag(body)
+            return _not_modified(request, body_etag, expire) or \
+                _cached_json_response(body, expire, body_etag)
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate_cache(*namespaces: str):
+    """
+    Drop all cached responses in the given namespaces.
+
+    Args:
+        namespaces: Cache namespaces to clear
+    """
+    for namespace in namespaces:
+        try:
+            keys = list(redis_client.client.scan_iter(match=f"{CACHE_PREFIX}:{namespace}:*"))
+            if keys:
+                redis_client.client.delete(*keys)
+            logger.debug(f"Invalidated {len(keys)} cached responses in namespace '{namespace}'")
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for namespace '{namespace}': {e}")
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -11,13 +12,40 @@ class Settings(BaseSettings):
     redis_db: int = 0
     redis_password: str = ""  # Redis password for authentication
     redis_channel_name: str = "events"  # Pub/Sub channel name
+    redis_max_connections: int = 64  # Connection pool size shared by API and camera threads
     
     # Database configuration
     database_url: str = "postgresql://vms_admin:AIvan0987@db:5432/vms_analytics_db"
+    db_pool_size: int = 10  # Persistent connections per engine
+    db_max_overflow: int = 5  # Extra connections allowed under burst load
+    db_pool_recycle: int = 60  # Seconds before a pooled connection is replaced
+    db_pool_timeout: int = 30  # Seconds to wait for a free connection
+    db_pool_pre_ping: bool = False  # Enable when not behind PgBouncer (transaction mode)
+    auto_create_database: bool = False  # Create the database on startup if it does not exist
+    run_migrations_on_startup: bool = True  # Create missing tables on startup; disable when schema is managed externally
     
     # YOLO configuration
     yolo_model: str = "/app/weights/general/yolov8m.pt"
     garbage_model: str = "/app/weights/garbage_detection/best.pt"
+    yolo_precision: str = "fp32"  # fp32 (PyTorch), fp16 via a TensorRT engine (int8 falls back to it on GPU), or int8 via OpenVINO on CPU; built on first load
+    yolo_imgsz: int = 640  # Inference input size; larger frames are downscaled to it before batching
+    yolo_int8_calibration_data: str = ""  # Dataset YAML with calibration images, required for int8
+    yolo_batch_size: int = 8  # Maximum frames from different cameras per YOLO forward pass
+    yolo_batch_wait_ms: float = 5.0  # How long a frame waits for others to join its batch
+    yolo_predict_timeout_seconds: float = 30.0  # How long a camera waits for its batch before giving up on the frame
+    yolo_compile: bool = False  # torch.compile eager (non-exported) models on CUDA; compiled during startup warmup
+    torch_num_threads: int = 4  # PyTorch intra-op threads per CPU forward pass; 0 = PyTorch default (all cores)
+    
+    # Motion detection configuration
+    motion_gpu: Optional[bool] = None  # Run motion detection with OpenCV CUDA; None = use it when OpenCV was built with CUDA
+    
+    # ANPR configuration
+    preload_anpr_model: bool = False  # Load the shared fast-alpr model at startup instead of on first use
+    anpr_gpu: Optional[bool] = None  # Run ANPR on CUDA; None = use it when ONNX Runtime reports it available
+    anpr_fp16: bool = False  # On GPU, run the plate detector as an FP16 TensorRT engine when TensorRT is available
+    anpr_trt_cache_dir: str = "/app/weights/anpr_trt_cache"  # Where built TensorRT engines are cached
+    anpr_openvino: bool = False  # On CPU, run ANPR through OpenVINO when onnxruntime-openvino is installed
+    anpr_intra_op_threads: int = 0  # Threads per ANPR inference; 0 = ONNX Runtime default (all cores)
     
     # API configuration
     api_host: str = "0.0.0.0"
@@ -28,6 +56,10 @@ class Settings(BaseSettings):
     enable_snapshots: bool = True
     snapshot_format: str = "jpg"
     snapshot_quality: int = 80
+    # Internal nginx location mapped to snapshots_dir; when set, snapshot downloads
+    # are handed to nginx via X-Accel-Redirect instead of being streamed by the app
+    snapshot_xaccel_prefix: str = ""
+    snapshot_delete_workers: int = 0  # Threads deleting expired snapshot files; 0 = min(32, 4 x CPU cores)
     
     # Logging
     log_level: str = "INFO"
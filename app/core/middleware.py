@@ -0,0 +1,25 @@
+"""
+HTTP middleware used by the API application.
+"""
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import Receive, Scope, Send
+
+
+class SnapshotAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware that leaves snapshot image downloads untouched.
+
+    Snapshots are already-compressed images, so gzipping them only burns CPU
+    and breaks range/sendfile handling for no size benefit.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, compresslevel: int = 6,
+                 excluded_suffixes: tuple = ("/snapshot",)):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.excluded_suffixes = excluded_suffixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].endswith(self.excluded_suffixes):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
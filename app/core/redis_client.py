@@ -1,17 +1,33 @@
 import redis
-import json
-from typing import Dict, Any
+import orjson
+from typing import Dict, Any, List, Union
 from app.core.config import get_settings
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+# Bound once; the publish methods run at the event rate
+_CHANNEL = settings.redis_channel_name
+
+
+def serialize_event(event_data: Dict[str, Any]) -> bytes:
+    """Serialize an event payload; numpy scalars/arrays from the detectors are handled natively."""
+    return orjson.dumps(event_data, option=orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _as_bytes(event: Union[Dict[str, Any], bytes]) -> bytes:
+    """Return an event's wire form, serializing it unless it already is bytes."""
+    return event if isinstance(event, bytes) else serialize_event(event)
+
 
 class RedisClient:
     """Redis client wrapper for Pub/Sub operations."""
     
+    __slots__ = ('_pool', '_client')
+    
     def __init__(self):
+        self._pool = None
         self._client = None
         self._connect()
     
@@ -22,40 +38,70 @@ class RedisClient:
                 "host": settings.redis_host,
                 "port": settings.redis_port,
                 "db": settings.redis_db,
-                "decode_responses": True
+                "max_connections": settings.redis_max_connections,
+                "socket_keepalive": True,
+                "health_check_interval": 30
             }
             # Add password if configured
             if settings.redis_password:
                 connection_kwargs["password"] = settings.redis_password
             
-            self._client = redis.Redis(**connection_kwargs)
+            # Explicit pool shared by the API and all camera worker threads
+            self._pool = redis.ConnectionPool(**connection_kwargs)
+            self._client = redis.Redis(connection_pool=self._pool)
             self._client.ping()
             logger.info(f"Connected to Redis at {settings.redis_host}:{settings.redis_port}")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             raise
     
-    def publish_event(self, event_data: Dict[str, Any]) -> int:
+    @property
+    def client(self) -> redis.Redis:
+        """Underlying Redis client, for callers that need commands beyond Pub/Sub."""
+        return self._client
+    
+    def publish_event(self, event_data: Union[Dict[str, Any], bytes]) -> int:
         """
         Publish event to Redis Pub/Sub channel.
         
         Args:
-            event_data: Event data dictionary to publish
+            event_data: Event data dictionary, or its bytes from serialize_event
             
         Returns:
             Number of subscribers that received the message
         """
         try:
-            num_subscribers = self._client.publish(
-                settings.redis_channel_name,
-                json.dumps(event_data)
-            )
-            logger.info(f"Published event to channel '{settings.redis_channel_name}': {event_data.get('event_type')} (subscribers: {num_subscribers})")
+            num_subscribers = self._client.publish(_CHANNEL, _as_bytes(event_data))
+            logger.info(f"Published event to channel '{_CHANNEL}' (subscribers: {num_subscribers})")
             return num_subscribers
         except Exception as e:
             logger.error(f"Failed to publish event: {e}")
             raise
     
+    def publish_events_batch(self, events: List[Union[Dict[str, Any], bytes]]) -> int:
+        """
+        Publish several events to the Pub/Sub channel in one round trip.
+        
+        Args:
+            events: Event data dictionaries (or their serialized bytes) to publish, in order
+            
+        Returns:
+            Total number of deliveries across all subscribers
+        """
+        if not events:
+            return 0
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            publish = pipe.publish
+            for event_data in events:
+                publish(_CHANNEL, _as_bytes(event_data))
+            num_subscribers = sum(pipe.execute())
+            logger.debug(f"Published {len(events)} events to channel '{_CHANNEL}' (deliveries: {num_subscribers})")
+            return num_subscribers
+        except Exception as e:
+            logger.error(f"Failed to publish event batch: {e}")
+            raise
+    
     def health_check(self) -> bool:
         """Check if Redis connection is healthy."""
         try:
@@ -68,6 +114,8 @@ class RedisClient:
         """Close Redis connection."""
         if self._client:
             self._client.close()
+        if self._pool:
+            self._pool.disconnect()
             logger.info("Redis connection closed")
 
 
@@ -1,11 +1,21 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.api.cameras import router as cameras_router
 from app.api.events import router as events_router
 from app.core.config import get_settings
-from app.core.database import init_db, check_db_connection
+from app.core.middleware import SnapshotAwareGZipMiddleware
+from app.core.database import (
+    initialize_database_connection,
+    initialize_async_database_connection,
+    init_db,
+    check_db_connection,
+    close_async_db
+)
 from app.services.video_worker import camera_manager
+from app.services.event_writer import event_writer
 from app.services.retention_scheduler import retention_scheduler
 from app.core.redis_client import redis_client
 from app.utils.logger import get_logger
@@ -18,6 +28,10 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     """
     Application lifespan manager for startup and shutdown events.
+    
+    Camera workers, the event writer and the retention scheduler live in
+    this process, and the camera registry is in memory, so the service must
+    run as a single uvicorn worker process.
     """
     # Startup
     logger.info("Starting Analytics Service")
@@ -35,14 +49,26 @@ async def lifespan(app: FastAPI):
     
     # Initialize database
     try:
-        if check_db_connection():
+        initialize_database_connection()
+        initialize_async_database_connection()
+        if await check_db_connection():
             logger.info("Database connection verified")
-            init_db()
+            if settings.run_migrations_on_startup:
+                await init_db()
         else:
             logger.error("Failed to connect to database")
     except Exception as e:
         logger.error(f"Database initialization error: {e}", exc_info=True)
     
+    # Pre-warm the shared ANPR model so the first ANPR camera starts instantly
+    if settings.preload_anpr_model:
+        try:
+            from app.services.anpr import get_alpr
+            await asyncio.to_thread(get_alpr)
+            logger.info("ANPR model preloaded")
+        except Exception as e:
+            logger.error(f"Failed to preload ANPR model: {e}", exc_info=True)
+    
     # Start retention scheduler
     try:
         retention_scheduler.start()
@@ -55,7 +81,9 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Analytics Service")
     camera_manager.stop_all()
+    event_writer.stop()
     retention_scheduler.stop()
+    await close_async_db()
     redis_client.close()
     logger.info("Analytics Service stopped")
 
@@ -65,7 +93,8 @@ app = FastAPI(
     title="Video Analytics Service",
     description="Standalone analytics service for video processing with object detection, motion detection, and ANPR",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -77,6 +106,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses larger than 1KB (snapshot images are skipped)
+app.add_middleware(SnapshotAwareGZipMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(cameras_router)
 app.include_router(events_router)
@@ -100,6 +132,8 @@ if __name__ == "__main__":
         host=settings.api_host,
         port=settings.api_port,
         reload=False,
+        loop="uvloop",
+        http="httptools",
         log_level=settings.log_level.lower()
     )
 
@@ -1,13 +1,35 @@
 """
 Database models for event storage.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, Computed, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
-from datetime import datetime
 
 Base = declarative_base()
 
+# Highest confidence found anywhere in an event payload (tracking confidence,
+# ANPR confidence or any detection's confidence). Generated columns cannot
+# contain subqueries, so the array walk lives in an IMMUTABLE function.
+MAX_CONFIDENCE_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION events_max_confidence(data jsonb)
+RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT GREATEST(
+        (data->>'confidence')::float,
+        (data->'anpr_result'->>'confidence')::float,
+        (
+            SELECT max((det->>'confidence')::float)
+            FROM jsonb_array_elements(
+                CASE WHEN jsonb_typeof(data->'detections') = 'array'
+                     THEN data->'detections' ELSE '[]'::jsonb END
+            ) AS det
+        )
+    )
+$$
+""")
+
 
 class EventRecord(Base):
     """
@@ -22,28 +44,42 @@ class EventRecord(Base):
     event_type = Column(String(50), nullable=False, index=True)  # detection, motion, anpr, tracking
     camera_id = Column(String(100), nullable=False, index=True)
     camera_name = Column(String(255), nullable=True)  # Human-readable camera name
-    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
     frame_number = Column(Integer, nullable=False)
     
     # Snapshot path
     snapshot_path = Column(String(500), nullable=True)  # Path to saved snapshot image
     
-    # Event-specific data stored as JSON
+    # Event-specific data stored as JSONB (parsed once on write, not on every read)
     # For detection: {detections: [...], model_info: {...}}
     # For motion: {motion_intensity: float, affected_area_percentage: float}
     # For ANPR: {anpr_result: {license_plate: str, confidence: float, region: str, vehicle_class: str}}
     # For tracking: {track_id: int, tracking_action: str, class_name: str, confidence: float, bounding_box: {...}, dwell_time_seconds: float}
-    event_data = Column(JSON, nullable=False)
+    event_data = Column(JSONB, nullable=False)
+    
+    # Filter columns derived from event_data by PostgreSQL, so list filters are plain B-tree lookups
+    class_name = Column(String(100), Computed("lower(event_data->>'class_name')", persisted=True))
+    max_confidence = Column(Float, Computed("events_max_confidence(event_data)", persisted=True))
     
     # Timestamps
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
     # Indexes for common queries
     __table_args__ = (
         Index('idx_camera_timestamp', 'camera_id', 'timestamp'),
         Index('idx_event_type_timestamp', 'event_type', 'timestamp'),
+        # Backs list_events: camera + type equality with newest-first ordering
+        Index('idx_camera_type_timestamp', 'camera_id', 'event_type', timestamp.desc()),
+        Index('idx_class_name', 'class_name'),
+        Index('idx_max_confidence', 'max_confidence'),
+        # Compact index for time-range scans (retention, stats); rows arrive in time order
+        Index('idx_events_ts_brin', 'timestamp', postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
     )
     
     def __repr__(self):
         return f"<EventRecord(id={self.id}, type={self.event_type}, camera={self.camera_id}, timestamp={self.timestamp})>"
 
+
+# The max_confidence generated column needs its function to exist before the table
+event.listen(EventRecord.__table__, "before_create", MAX_CONFIDENCE_FUNCTION)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -39,6 +39,9 @@ class CameraParameters(BaseModel):
     track_buffer_frames: int = Field(default=30, ge=1, description="Frames to wait before considering object 'left'")
     min_dwell_time_seconds: float = Field(default=1.0, ge=0.0, description="Minimum time before triggering 'left' event")
     tracking_confidence_threshold: float = Field(default=0.3, ge=0.0, le=1.0, description="Confidence threshold for tracking")
+    motion_gate_threshold: float = Field(default=0.0, ge=0.0, le=1.0, description="Skip object and garbage detection while the motion score is below this (0 disables gating; needs motion detection)")
+    motion_gate_hold_frames: int = Field(default=15, ge=0, description="Frames to keep running object and garbage detection after the last motion")
+    motion_gate_track_stride: int = Field(default=5, ge=1, description="While gated with objects still tracked, run object and garbage detection every Nth frame")
     
     # Garbage detection parameters
     garbage_confidence_threshold: float = Field(default=0.5, ge=0.0, le=1.0, description="Confidence threshold for garbage detection")
@@ -66,9 +69,11 @@ class CameraConfig(BaseModel):
     parameters: CameraParameters = Field(default_factory=CameraParameters)
 
 
+# Models built on every processed frame are frozen: they are never modified
+# after construction, so Pydantic can skip assignment validation entirely.
 class BoundingBox(BaseModel):
     """Bounding box coordinates (normalized 0-1)."""
-    model_config = {"protected_namespaces": ()}
+    model_config = ConfigDict(protected_namespaces=(), frozen=True)
     
     x: float = Field(ge=0.0, le=1.0)
     y: float = Field(ge=0.0, le=1.0)
@@ -78,7 +83,7 @@ class BoundingBox(BaseModel):
 
 class Detection(BaseModel):
     """Single object detection."""
-    model_config = {"protected_namespaces": ()}
+    model_config = ConfigDict(protected_namespaces=(), frozen=True)
     
     class_name: str
     confidence: float = Field(ge=0.0, le=1.0)
@@ -88,7 +93,7 @@ class Detection(BaseModel):
 
 class ModelInfo(BaseModel):
     """Model information."""
-    model_config = {"protected_namespaces": ()}
+    model_config = ConfigDict(protected_namespaces=(), frozen=True)
     
     model_type: str
     version: str
@@ -96,7 +101,7 @@ class ModelInfo(BaseModel):
 
 class DetectionEvent(BaseModel):
     """Object detection event."""
-    model_config = {"protected_namespaces": ()}
+    model_config = ConfigDict(protected_namespaces=(), frozen=True)
     
     event_type: str = "detection"
     camera_id: str
@@ -108,7 +113,7 @@ class DetectionEvent(BaseModel):
 
 class MotionEvent(BaseModel):
     """Motion detection event."""
-    model_config = {"protected_namespaces": ()}
+    model_config = ConfigDict(protected_namespaces=(), frozen=True)
     
     event_type: str = "motion"
     camera_id: str
@@ -141,7 +146,7 @@ class ANPREvent(BaseModel):
 
 class TrackingEvent(BaseModel):
     """Tracking event for object lifecycle (enter/leave/update)."""
-    model_config = {"protected_namespaces": ()}
+    model_config = ConfigDict(protected_namespaces=(), frozen=True)
     
     event_type: str = "tracking"
     camera_id: str
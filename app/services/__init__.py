@@ -1,10 +1,18 @@
 """Services package for video analytics."""
 
-from app.services.detection import ObjectDetector
-from app.services.motion import MotionDetector
-from app.services.anpr import ANPRDetector
-from app.services.event_filter import EventFilter
-from app.services.video_worker import CameraWorker, camera_manager
+import importlib
+
+# Exported names and the submodules defining them. They are imported on first
+# access (PEP 562) so that importing any one service module doesn't pull in
+# torch, ultralytics and fast-alpr through this package.
+_LAZY_EXPORTS = {
+    'ObjectDetector': 'app.services.detection',
+    'MotionDetector': 'app.services.motion',
+    'ANPRDetector': 'app.services.anpr',
+    'EventFilter': 'app.services.event_filter',
+    'CameraWorker': 'app.services.video_worker',
+    'camera_manager': 'app.services.video_worker'
+}
 
 __all__ = [
     'ObjectDetector',
@@ -15,3 +23,9 @@ __all__ = [
     'camera_manager'
 ]
 
+
+def __getattr__(name):
+    """Import exported services on first access."""
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
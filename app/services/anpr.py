@@ -1,17 +1,167 @@
+import threading
+import cv2
 import numpy as np
-from typing import Optional
+import onnxruntime
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
 from fast_alpr import ALPR
-from app.models.event_models import ANPREvent, ANPRResult
+from app.core.config import get_settings
+from app.models.event_models import ANPREvent, ANPRResult, BoundingBox
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
+settings = get_settings()
+
+# Default fast-alpr models
+DEFAULT_DETECTOR_MODEL = "yolo-v9-t-384-license-plate-end2end"
+DEFAULT_OCR_MODEL = "cct-xs-v1-global-model"
+
+# Frames wider than this are downscaled before plate detection when no vehicle box is known
+MAX_OCR_WIDTH = 960
+
+# Margin added around the vehicle box, as a fraction of its size, so plates on the edge are kept
+VEHICLE_CROP_PADDING = 0.1
+
+# A candidate this confident cannot be beaten, so the remaining ones are skipped
+PERFECT_CONFIDENCE = 1.0 - 1e-6
+
+_alpr_lock = threading.Lock()
+
+
+def _use_gpu() -> bool:
+    """Decide whether ANPR runs on CUDA, honouring the anpr_gpu override."""
+    if settings.anpr_gpu is not None:
+        return settings.anpr_gpu
+    return "CUDAExecutionProvider" in onnxruntime.get_available_providers()
+
+
+def _cpu_providers() -> List[Any]:
+    """ONNX Runtime providers for CPU inference, with OpenVINO first when enabled and installed."""
+    if settings.anpr_openvino and "OpenVINOExecutionProvider" in onnxruntime.get_available_providers():
+        return [("OpenVINOExecutionProvider", {"device_type": "CPU"}), "CPUExecutionProvider"]
+    return ["CPUExecutionProvider"]
+
+
+def _session_options() -> onnxruntime.SessionOptions:
+    """
+    ONNX Runtime session options for the ANPR models.
+    
+    Every camera shares the same sessions, so concurrent calls share one
+    intra-op thread pool; anpr_intra_op_threads caps its size.
+    """
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if settings.anpr_intra_op_threads > 0:
+        options.intra_op_num_threads = settings.anpr_intra_op_threads
+    return options
+
+
+def _execution_providers(use_gpu: bool) -> List[Any]:
+    """
+    ONNX Runtime providers for the plate detector, in order of preference.
+    
+    With anpr_fp16 enabled and TensorRT available, the detector runs as an
+    FP16 TensorRT engine; the engine is cached on disk so only the first
+    start pays for the build.
+    """
+    if not use_gpu:
+        return _cpu_providers()
+    
+    providers: List[Any] = []
+    if settings.anpr_fp16 and "TensorrtExecutionProvider" in onnxruntime.get_available_providers():
+        providers.append(("TensorrtExecutionProvider", {
+            "trt_fp16_enable": True,
+            "trt_engine_cache_enable": True,
+            "trt_engine_cache_path": settings.anpr_trt_cache_dir
+        }))
+    providers.extend(["CUDAExecutionProvider", "CPUExecutionProvider"])
+    return providers
+
+
+@lru_cache(maxsize=4)
+def _load_alpr(detector_model: str, ocr_model: str, use_gpu: bool) -> ALPR:
+    """Load a fast-alpr pipeline; cached so every camera shares one copy per model pair."""
+    logger.info(f"Loading fast-alpr model (detector: {detector_model}, OCR: {ocr_model}, device: {'cuda' if use_gpu else 'cpu'})")
+    alpr = ALPR(
+        detector_model=detector_model,
+        detector_providers=_execution_providers(use_gpu),
+        detector_sess_options=_session_options(),
+        ocr_model=ocr_model,
+        ocr_device="cuda" if use_gpu else "cpu",
+        ocr_providers=None if use_gpu else _cpu_providers(),
+        ocr_sess_options=_session_options()
+    )
+    logger.info("fast-alpr model loaded successfully")
+    return alpr
+
+
+def get_alpr(detector_model: str = DEFAULT_DETECTOR_MODEL, ocr_model: str = DEFAULT_OCR_MODEL) -> ALPR:
+    """
+    Get the shared fast-alpr pipeline for a model pair, loading it on first use.
+    
+    ONNX Runtime sessions are safe to run from several threads, so camera
+    workers can share the instance.
+    
+    Args:
+        detector_model: License plate detection model name
+        ocr_model: OCR model name for reading plates
+        
+    Returns:
+        Shared ALPR instance
+    """
+    # Serialize first loads so concurrent camera registrations don't load the model twice
+    with _alpr_lock:
+        return _load_alpr(detector_model, ocr_model, _use_gpu())
+
+
+def _plate_search_region(frame: np.ndarray, vehicle_bbox: Optional[BoundingBox]) -> np.ndarray:
+    """
+    Reduce a frame to the pixels worth searching for plates.
+    
+    Args:
+        frame: Input frame (numpy array)
+        vehicle_bbox: Normalized box around the vehicle(s) in the frame, if known
+        
+    Returns:
+        The padded vehicle crop, or the frame downscaled to at most MAX_OCR_WIDTH wide
+    """
+    h, w = frame.shape[:2]
+    
+    if vehicle_bbox is not None:
+        pad_x = vehicle_bbox.width * VEHICLE_CROP_PADDING
+        pad_y = vehicle_bbox.height * VEHICLE_CROP_PADDING
+        x1 = max(int((vehicle_bbox.x - pad_x) * w), 0)
+        y1 = max(int((vehicle_bbox.y - pad_y) * h), 0)
+        x2 = min(int((vehicle_bbox.x + vehicle_bbox.width + pad_x) * w), w)
+        y2 = min(int((vehicle_bbox.y + vehicle_bbox.height + pad_y) * h), h)
+        if x2 > x1 and y2 > y1:
+            return frame[y1:y2, x1:x2]
+    
+    if w > MAX_OCR_WIDTH:
+        scale = MAX_OCR_WIDTH / w
+        return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def _read_ocr_result(result) -> Tuple[Optional[str], Optional[float]]:
+    """Read plate text and confidence from a fast-alpr ALPRResult (result.ocr)."""
+    ocr_result = result.ocr
+    return ocr_result.text, ocr_result.confidence
+
+
+def _read_legacy_result(result) -> Tuple[Optional[str], Optional[float]]:
+    """Read plate text and confidence from the legacy flat result format."""
+    return result.license_plate, result.confidence
 
 
 class ANPRDetector:
     """Automatic Number Plate Recognition service using fast-alpr."""
     
-    def __init__(self, detector_model: str = "yolo-v9-t-384-license-plate-end2end", 
-                 ocr_model: str = "cct-xs-v1-global-model"):
+    # One detector per ANPR camera, all sharing the cached ALPR pipeline
+    __slots__ = ('detector_model', 'ocr_model', 'alpr', '_read_result')
+    
+    def __init__(self, detector_model: str = DEFAULT_DETECTOR_MODEL,
+                 ocr_model: str = DEFAULT_OCR_MODEL):
         """
         Initialize ANPR detector using fast-alpr.
         
@@ -22,17 +172,14 @@ class ANPRDetector:
         self.detector_model = detector_model
         self.ocr_model = ocr_model
         self.alpr = None
+        # Result reader for the installed fast-alpr version, picked from the first result
+        self._read_result = None
         self._load_model()
     
     def _load_model(self):
-        """Load fast-alpr model."""
+        """Get the shared fast-alpr model (loaded once per process)."""
         try:
-            logger.info(f"Loading fast-alpr model (detector: {self.detector_model}, OCR: {self.ocr_model})")
-            self.alpr = ALPR(
-                detector_model=self.detector_model,
-                ocr_model=self.ocr_model
-            )
-            logger.info("fast-alpr model loaded successfully")
+            self.alpr = get_alpr(self.detector_model, self.ocr_model)
         except Exception as e:
             logger.error(f"Failed to load fast-alpr model: {e}")
             raise
@@ -42,23 +189,28 @@ class ANPRDetector:
         frame: np.ndarray,
         camera_id: str,
         frame_number: int,
-        confidence_threshold: float = 0.5
+        confidence_threshold: float = 0.5,
+        vehicle_bbox: Optional[BoundingBox] = None
     ) -> Optional[ANPREvent]:
         """
         Detect license plates in a frame.
         
+        Only the vehicle region is searched when `vehicle_bbox` is given;
+        otherwise large frames are downscaled first.
+        
         Args:
             frame: Input frame (numpy array)
             camera_id: Camera identifier
             frame_number: Frame number
             confidence_threshold: Minimum confidence threshold
+            vehicle_bbox: Normalized box around the vehicle(s), from object tracking
             
         Returns:
             ANPREvent if plate detected, None otherwise
         """
         try:
-            # Run fast-alpr prediction
-            alpr_results = self.alpr.predict(frame)
+            # Run fast-alpr prediction on the smallest useful region
+            alpr_results = self.alpr.predict(_plate_search_region(frame, vehicle_bbox))
             
             # Find best license plate candidate
             best_plate = None
@@ -70,42 +222,40 @@ class ANPRDetector:
                 if not isinstance(alpr_results, list):
                     alpr_results = [alpr_results]
                 
+                # fast-alpr returns ALPRResult with ocr and detection attributes;
+                # older versions return flat license_plate/confidence results
+                read_result = self._read_result
+                if read_result is None:
+                    read_result = _read_ocr_result if hasattr(alpr_results[0], 'ocr') else _read_legacy_result
+                    self._read_result = read_result
+                
                 # Process each result
                 for result in alpr_results:
-                    # fast-alpr returns ALPRResult with ocr and detection attributes
-                    # Extract plate text and confidence from ocr result
-                    plate_text = None
-                    confidence = 0.0
-                    
-                    # Check for ocr attribute (fast-alpr structure)
-                    if hasattr(result, 'ocr'):
-                        ocr_result = result.ocr
-                        if hasattr(ocr_result, 'text') and hasattr(ocr_result, 'confidence'):
-                            plate_text = ocr_result.text
-                            confidence = ocr_result.confidence
-                        else:
-                            logger.warning(f"ANPR: Result ocr missing text or confidence: {ocr_result}")
-                    # Fallback: check for direct license_plate and confidence attributes (legacy format)
-                    elif hasattr(result, 'license_plate') and hasattr(result, 'confidence'):
-                        plate_text = result.license_plate
-                        confidence = result.confidence
-                    else:
-                        logger.warning(f"ANPR: Result missing expected attributes: {result}")
+                    try:
+                        plate_text, confidence = read_result(result)
+                    except AttributeError:
+                        # e.g. a plate was detected but could not be read
+                        logger.debug(f"ANPR: Skipping result without plate text: {result}")
+                        continue
+                    if plate_text is None or confidence is None:
+                        continue
                     
                     # Check confidence threshold and update best plate
                     if plate_text and confidence > confidence_threshold and confidence > best_confidence:
                         best_confidence = confidence
                         best_plate = plate_text
+                        if best_confidence >= PERFECT_CONFIDENCE:
+                            break
             
-            # Return event if plate found
+            # Return event if plate found (built from our own values, so skip validation)
             if best_plate:
-                anpr_result = ANPRResult(
+                anpr_result = ANPRResult.model_construct(
                     license_plate=best_plate,
                     confidence=best_confidence,
                     region=None  # fast-alpr may provide region in future versions
                 )
                 
-                return ANPREvent(
+                return ANPREvent.model_construct(
                     camera_id=camera_id,
                     anpr_result=anpr_result,
                     frame_number=frame_number
@@ -1,60 +1,177 @@
-from ultralytics import YOLO
 import numpy as np
-import torch
+import supervision as sv
 from typing import List, Optional, Dict, Tuple
 from app.core.config import get_settings
 from app.models.event_models import Detection, BoundingBox, TrackingEvent, ModelInfo
+from app.services.motion import MotionGate
+from app.services.yolo_runner import get_yolo_runner, to_detections
 from app.utils.logger import get_logger
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; track housekeeping falls back to NumPy
+    njit = None
+
 logger = get_logger(__name__)
 settings = get_settings()
 
-# Fix for PyTorch 2.6+ weights_only security change
-# Monkey patch torch.load to use weights_only=False for trusted ultralytics models
-# This is safe because we only load official YOLOv8 models from ultralytics
-_original_torch_load = torch.load
 
-def _patched_torch_load(*args, **kwargs):
-    """Patched torch.load that sets weights_only=False for compatibility with YOLO models."""
-    if 'weights_only' not in kwargs:
-        kwargs['weights_only'] = False
-    return _original_torch_load(*args, **kwargs)
+def _advance_missing_loop(in_use, last_seen, frames_missing, frame_number, elapsed_frames, buffer_frames):
+    """Single-pass housekeeping kernel, compiled with numba when it is installed."""
+    expired = np.empty(in_use.shape[0], dtype=np.int64)
+    count = 0
+    for slot in range(in_use.shape[0]):
+        if in_use[slot] and last_seen[slot] != frame_number:
+            frames_missing[slot] += elapsed_frames
+            if frames_missing[slot] > buffer_frames:
+                expired[count] = slot
+                count += 1
+    return expired[:count]
+
+
+def _advance_missing_numpy(in_use, last_seen, frames_missing, frame_number, elapsed_frames, buffer_frames):
+    """Vectorized NumPy equivalent of _advance_missing_loop."""
+    missing = in_use & (last_seen != frame_number)
+    frames_missing[missing] += elapsed_frames
+    return np.flatnonzero(missing & (frames_missing > buffer_frames))
 
-torch.load = _patched_torch_load
-logger.debug("Patched torch.load for YOLO model compatibility")
 
+_advance_missing = njit(cache=True, nogil=True)(_advance_missing_loop) if njit else _advance_missing_numpy
 
-class TrackedObject:
-    """Represents a tracked object across frames."""
+
+class TrackArena:
+    """
+    Per-camera track state stored as parallel NumPy arrays (one row per track).
+    
+    Rows are recycled through a free list, so steady-state tracking allocates
+    nothing, and the per-frame "which tracks went missing / which have left"
+    bookkeeping is a handful of vectorized array operations instead of a
+    Python loop over every active track.
+    """
+    
+    def __init__(self, capacity: int = 64):
+        """
+        Initialize an empty arena.
+        
+        Args:
+            capacity: Initial number of rows (doubles when exhausted)
+        """
+        self.track_ids = np.zeros(capacity, dtype=np.int64)
+        self.first_seen = np.zeros(capacity, dtype=np.int64)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+        self.frames_missing = np.zeros(capacity, dtype=np.int32)
+        self.boxes = np.zeros((capacity, 4), dtype=np.float32)  # normalized x, y, width, height
+        self.in_use = np.zeros(capacity, dtype=bool)
+        self.class_names: List[Optional[str]] = [None] * capacity
+        self.slots: Dict[int, int] = {}  # track_id -> row
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
     
-    def __init__(self, track_id: int, class_name: str, frame_number: int):
-        self.track_id = track_id
-        self.class_name = class_name
-        self.first_seen_frame = frame_number
-        self.last_seen_frame = frame_number
-        self.frame_count = 1
-        self.positions = []  # For trajectory tracking
+    def __len__(self) -> int:
+        return len(self.slots)
     
-    def update(self, frame_number: int, bbox: BoundingBox):
-        """Update track with new detection."""
-        self.last_seen_frame = frame_number
-        self.frame_count += 1
-        self.positions.append(bbox)
+    def _grow(self):
+        """Double the arena's capacity."""
+        capacity = len(self.in_use)
+        self.track_ids = np.concatenate([self.track_ids, np.zeros(capacity, dtype=np.int64)])
+        self.first_seen = np.concatenate([self.first_seen, np.zeros(capacity, dtype=np.int64)])
+        self.last_seen = np.concatenate([self.last_seen, np.zeros(capacity, dtype=np.int64)])
+        self.frames_missing = np.concatenate([self.frames_missing, np.zeros(capacity, dtype=np.int32)])
+        self.boxes = np.concatenate([self.boxes, np.zeros((capacity, 4), dtype=np.float32)])
+        self.in_use = np.concatenate([self.in_use, np.zeros(capacity, dtype=bool)])
+        self.class_names.extend([None] * capacity)
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
     
-    def get_dwell_time(self, fps: float = 30.0) -> float:
-        """Calculate dwell time in seconds."""
-        return (self.last_seen_frame - self.first_seen_frame) / fps
+    def add(self, track_id: int, class_name: str, frame_number: int) -> int:
+        """
+        Start tracking a new object.
+        
+        Args:
+            track_id: Tracker-assigned ID
+            class_name: Detected class name
+            frame_number: Frame the object first appeared in
+            
+        Returns:
+            Row index of the new track
+        """
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.track_ids[slot] = track_id
+        self.first_seen[slot] = frame_number
+        self.last_seen[slot] = frame_number
+        self.frames_missing[slot] = 0
+        self.in_use[slot] = True
+        self.class_names[slot] = class_name
+        self.slots[track_id] = slot
+        return slot
+    
+    def release(self, slot: int):
+        """
+        Stop tracking the object in a row and make the row reusable.
+        
+        Args:
+            slot: Row index
+        """
+        del self.slots[int(self.track_ids[slot])]
+        self.in_use[slot] = False
+        self.class_names[slot] = None
+        self._free.append(slot)
+    
+    def advance_missing(self, frame_number: int, elapsed_frames: int, buffer_frames: int) -> List[int]:
+        """
+        Age the tracks not seen in a frame and find those that have left.
+        
+        Args:
+            frame_number: Current frame number
+            elapsed_frames: Frames since the previous update
+            buffer_frames: Missing frames after which a track has left
+            
+        Returns:
+            Rows of the tracks that have now been missing for more than buffer_frames
+        """
+        return _advance_missing(
+            self.in_use, self.last_seen, self.frames_missing,
+            frame_number, elapsed_frames, buffer_frames
+        ).tolist()
+    
+    def box(self, slot: int) -> BoundingBox:
+        """Get the latest bounding box of the track in a row."""
+        x, y, width, height = self.boxes[slot].tolist()
+        return BoundingBox.model_construct(x=x, y=y, width=width, height=height)
+    
+    def active_class_names(self) -> List[str]:
+        """Get the class name of every active track."""
+        return [self.class_names[slot] for slot in self.slots.values()]
+    
+    def visible_boxes(self, frame_number: int) -> List[Tuple[str, BoundingBox]]:
+        """
+        Get the tracks seen in a given frame.
+        
+        Args:
+            frame_number: Frame number
+            
+        Returns:
+            (class_name, latest bounding box) for every track seen in that frame
+        """
+        return [
+            (self.class_names[slot], self.box(slot))
+            for slot in np.flatnonzero(self.in_use & (self.last_seen == frame_number)).tolist()
+        ]
     
-    def __repr__(self):
-        return f"TrackedObject(id={self.track_id}, class={self.class_name}, frames={self.frame_count})"
+    def clear(self):
+        """Drop all tracks."""
+        for slot in list(self.slots.values()):
+            self.release(slot)
 
 
 class ObjectDetector:
     """
     YOLOv8 object detection service with ByteTrack tracking support.
     
-    This uses YOLO's built-in ByteTrack implementation to assign unique IDs
-    to detected objects and track them across frames.
+    Inference goes through a runner shared by all cameras, which batches
+    concurrent frames into one forward pass. Each detector keeps its own
+    ByteTrack instance (from supervision) to assign unique IDs to detected
+    objects and track them across this camera's frames.
     """
     
     def __init__(
@@ -62,7 +179,10 @@ class ObjectDetector:
         model_path: Optional[str] = None,
         enable_tracking: bool = True,
         track_buffer_frames: int = 30,
-        min_dwell_time_seconds: float = 1.0
+        min_dwell_time_seconds: float = 1.0,
+        motion_gate_threshold: float = 0.0,
+        motion_gate_hold_frames: int = 15,
+        motion_gate_track_stride: int = 5
     ):
         """
         Initialize YOLO model with tracking.
@@ -72,36 +192,80 @@ class ObjectDetector:
             enable_tracking: Enable object tracking (vs. simple detection)
             track_buffer_frames: Frames to wait before considering object "left"
             min_dwell_time_seconds: Minimum dwell time to trigger "left" event
+            motion_gate_threshold: Skip inference while the motion score stays below this (0 disables gating)
+            motion_gate_hold_frames: Frames to keep running inference after the last motion
+            motion_gate_track_stride: While gated with objects still tracked, run inference every Nth frame
         """
         self.model_path = model_path or settings.yolo_model
         self.enable_tracking = enable_tracking
         self.track_buffer_frames = track_buffer_frames
         self.min_dwell_time_seconds = min_dwell_time_seconds
+        self.runner = None
         self.model = None
+        self._names_list: List[str] = []
+        self._model_info: Optional[ModelInfo] = None
+        self._target_ids_cache: Dict[Tuple[str, ...], np.ndarray] = {}
+        self.tracker = sv.ByteTrack() if enable_tracking else None
         
         # Tracking state
-        self.active_tracks: Dict[int, TrackedObject] = {}
-        self.lost_tracks: Dict[int, Tuple[TrackedObject, int]] = {}  # track_id -> (object, frames_since_seen)
+        self.tracks = TrackArena()
+        
+        # Motion gating state
+        self.motion_gate = MotionGate(motion_gate_threshold, motion_gate_hold_frames, motion_gate_track_stride)
+        self._skipped_frames = 0  # detect() calls skipped since the last inference
         
         self._load_model()
     
     def _load_model(self):
-        """Load YOLO model."""
+        """Get the shared batched YOLO runner (the model is loaded once per process)."""
         try:
             logger.info(f"Loading YOLO model with tracking: {self.model_path}")
-            self.model = YOLO(self.model_path)
+            self.runner = get_yolo_runner(self.model_path)
+            self.model = self.runner.model
+            
+            # Per-detector constants, resolved once instead of per box/event
+            self._names_list = [self.model.names.get(i, str(i)) for i in range(max(self.model.names) + 1)]
+            self._model_info = ModelInfo(
+                model_type=self.model_path.replace('.pt', ''),
+                version="8.1.0"
+            )
             logger.info(f"YOLO model loaded successfully (tracking={'enabled' if self.enable_tracking else 'disabled'})")
         except Exception as e:
             logger.error(f"Failed to load YOLO model: {e}")
             raise
     
+    def _target_class_ids(self, target_classes: List[str]) -> np.ndarray:
+        """
+        Get the model class IDs for a list of class names.
+        
+        Cached per distinct list, so the name lookup runs once per camera
+        configuration rather than per detection.
+        
+        Args:
+            target_classes: Target class names
+            
+        Returns:
+            Array of matching class IDs
+        """
+        key = tuple(target_classes)
+        class_ids = self._target_ids_cache.get(key)
+        if class_ids is None:
+            wanted = frozenset(target_classes)
+            class_ids = np.array(
+                [class_id for class_id, name in enumerate(self._names_list) if name in wanted],
+                dtype=np.int64
+            )
+            self._target_ids_cache[key] = class_ids
+        return class_ids
+    
     def detect(
         self,
         frame: np.ndarray,
         camera_id: str,
         frame_number: int,
         confidence_threshold: float = 0.5,
-        target_classes: Optional[List[str]] = None
+        target_classes: Optional[List[str]] = None,
+        motion_score: Optional[float] = None
     ) -> List[TrackingEvent]:
         """
         Perform object detection with tracking.
@@ -116,6 +280,7 @@ class ObjectDetector:
             frame_number: Frame number
             confidence_threshold: Minimum confidence threshold
             target_classes: List of target class names to detect
+            motion_score: Recent motion score of the scene, used for motion gating (None disables it)
             
         Returns:
             List of TrackingEvent objects (empty list if no events)
@@ -123,141 +288,110 @@ class ObjectDetector:
         try:
             events = []
             
-            # Run inference with tracking
+            # Static scene: skip inference, catching up on missed frames next time
+            if self.motion_gate.should_skip(frame_number, motion_score, len(self.tracks) > 0):
+                self._skipped_frames += 1
+                return events
+            elapsed_frames = self._skipped_frames + 1
+            self._skipped_frames = 0
+            
+            # Run inference as part of a cross-camera batch, filtering classes in NMS
+            target_ids = self._target_class_ids(target_classes) if target_classes else None
+            result = self.runner.predict(frame, classes=None if target_ids is None else target_ids.tolist())
+            detections = to_detections(result)
+            
+            # Drop classes other cameras in the batch asked for before tracking
+            if target_ids is not None:
+                detections = detections[np.isin(detections.class_id, target_ids)]
+            
+            # Track per camera; the shared model carries no tracker state
             if self.enable_tracking:
-                results = self.model.track(frame, persist=True, verbose=False)
-            else:
-                results = self.model(frame, verbose=False)
+                detections = self.tracker.update_with_detections(detections)
             
-            current_frame_tracks = set()
+            h, w = result.orig_shape  # Size of the (possibly downscaled) frame the boxes refer to
+            inv_w, inv_h = 1.0 / w, 1.0 / h
             
-            # Process results
-            for result in results:
-                boxes = result.boxes
-                
-                if len(boxes) == 0:
-                    continue
+            # Filter by confidence in one vectorized pass. The tracker above
+            # still sees low-score boxes, which ByteTrack uses for association.
+            keep = detections.confidence >= confidence_threshold
+            
+            # Only tracked detections (with an ID) produce events
+            if not self.enable_tracking or detections.tracker_id is None:
+                keep[:] = False
+            
+            # Normalize all surviving boxes at once: xyxy pixels -> x, y, width, height
+            xyxy = detections.xyxy[keep]
+            boxes = np.empty_like(xyxy)
+            boxes[:, 0] = xyxy[:, 0] * inv_w
+            boxes[:, 1] = xyxy[:, 1] * inv_h
+            boxes[:, 2] = (xyxy[:, 2] - xyxy[:, 0]) * inv_w
+            boxes[:, 3] = (xyxy[:, 3] - xyxy[:, 1]) * inv_h
+            
+            confidences = detections.confidence[keep].tolist()
+            class_ids = detections.class_id[keep].tolist()
+            track_ids = detections.tracker_id[keep].tolist() if detections.tracker_id is not None else []
+            
+            # Process detections
+            for box, confidence, class_id, track_id in zip(boxes.tolist(), confidences, class_ids, track_ids):
+                # Get class name
+                class_name = self._names_list[class_id]
                 
-                for i in range(len(boxes)):
-                    confidence = float(boxes.conf[i])
-                    
-                    # Filter by confidence
-                    if confidence < confidence_threshold:
-                        continue
-                    
-                    # Get class name
-                    class_id = int(boxes.cls[i])
-                    class_name = self.model.names[class_id]
-                    
-                    # Filter by target classes
-                    if target_classes and class_name not in target_classes:
-                        continue
-                    
-                    # Get tracking ID (only available with track=True)
-                    track_id = None
-                    if self.enable_tracking and boxes.id is not None and len(boxes.id) > i:
-                        track_id = int(boxes.id[i])
+                # Check if this is a new track
+                slot = self.tracks.slots.get(track_id)
+                if slot is None:
+                    # NEW OBJECT ENTERED
+                    slot = self.tracks.add(track_id, class_name, frame_number)
+                    self.tracks.boxes[slot] = box
                     
-                    if track_id is None:
-                        # No tracking ID available, skip
-                        continue
-                    
-                    current_frame_tracks.add(track_id)
-                    
-                    # Get bounding box (xyxy format)
-                    box = boxes.xyxy[i].cpu().numpy()
-                    
-                    # Normalize coordinates
-                    h, w = frame.shape[:2]
-                    x1, y1, x2, y2 = box
-                    
-                    bbox = BoundingBox(
-                        x=float(x1 / w),
-                        y=float(y1 / h),
-                        width=float((x2 - x1) / w),
-                        height=float((y2 - y1) / h)
+                    # Generate entry event (values come straight from the model, so skip validation)
+                    event = TrackingEvent.model_construct(
+                        camera_id=camera_id,
+                        track_id=track_id,
+                        tracking_action="entered",
+                        class_name=class_name,
+                        frame_number=frame_number,
+                        confidence=confidence,
+                        bounding_box=BoundingBox.model_construct(x=box[0], y=box[1], width=box[2], height=box[3]),
+                        model_info=self._model_info
                     )
+                    events.append(event)
                     
-                    # Check if this is a new track
-                    if track_id not in self.active_tracks:
-                        # NEW OBJECT ENTERED
-                        tracked_obj = TrackedObject(track_id, class_name, frame_number)
-                        tracked_obj.update(frame_number, bbox)
-                        self.active_tracks[track_id] = tracked_obj
-                        
-                        # Create model info
-                        model_info = ModelInfo(
-                            model_type=self.model_path.replace('.pt', ''),
-                            version="8.1.0"
-                        )
-                        
-                        # Generate entry event
-                        event = TrackingEvent(
-                            camera_id=camera_id,
-                            track_id=track_id,
-                            tracking_action="entered",
-                            class_name=class_name,
-                            frame_number=frame_number,
-                            confidence=confidence,
-                            bounding_box=bbox,
-                            model_info=model_info
-                        )
-                        events.append(event)
-                        
-                        logger.info(f"Camera {camera_id}: Object {class_name} entered (track_id={track_id})")
-                    else:
-                        # Update existing track
-                        self.active_tracks[track_id].update(frame_number, bbox)
-                        
-                        # Remove from lost tracks if it was there
-                        if track_id in self.lost_tracks:
-                            del self.lost_tracks[track_id]
+                    logger.info(f"Camera {camera_id}: Object {class_name} entered (track_id={track_id})")
+                else:
+                    # Update existing track (and clear its missing count if it was lost)
+                    self.tracks.last_seen[slot] = frame_number
+                    self.tracks.frames_missing[slot] = 0
+                    self.tracks.boxes[slot] = box
             
             # Check for objects that are no longer detected
-            for track_id in list(self.active_tracks.keys()):
-                if track_id not in current_frame_tracks:
-                    # Object not in current frame
-                    tracked_obj = self.active_tracks[track_id]
+            tracks = self.tracks
+            
+            # Objects missing for longer than the buffer have left
+            for slot in tracks.advance_missing(frame_number, elapsed_frames, self.track_buffer_frames):
+                # OBJECT LEFT
+                track_id = int(tracks.track_ids[slot])
+                class_name = tracks.class_names[slot]
+                dwell_time = float(tracks.last_seen[slot] - tracks.first_seen[slot]) / 30.0
+                
+                # Only generate event if object was present long enough
+                if dwell_time >= self.min_dwell_time_seconds:
+                    event = TrackingEvent.model_construct(
+                        camera_id=camera_id,
+                        track_id=track_id,
+                        tracking_action="left",
+                        class_name=class_name,
+                        frame_number=frame_number,
+                        confidence=0.0,  # Not applicable for "left" event
+                        bounding_box=tracks.box(slot),
+                        dwell_time_seconds=dwell_time,
+                        model_info=self._model_info
+                    )
+                    events.append(event)
                     
-                    if track_id not in self.lost_tracks:
-                        # First frame where object is missing
-                        self.lost_tracks[track_id] = (tracked_obj, 0)
-                    else:
-                        # Increment frames since last seen
-                        obj, frames_lost = self.lost_tracks[track_id]
-                        self.lost_tracks[track_id] = (obj, frames_lost + 1)
-                        
-                        # Check if object should be considered "left"
-                        if frames_lost >= self.track_buffer_frames:
-                            # OBJECT LEFT
-                            dwell_time = tracked_obj.get_dwell_time()
-                            
-                            # Only generate event if object was present long enough
-                            if dwell_time >= self.min_dwell_time_seconds:
-                                # Create model info
-                                model_info = ModelInfo(
-                                    model_type=self.model_path.replace('.pt', ''),
-                                    version="8.1.0"
-                                )
-                                
-                                event = TrackingEvent(
-                                    camera_id=camera_id,
-                                    track_id=track_id,
-                                    tracking_action="left",
-                                    class_name=tracked_obj.class_name,
-                                    frame_number=frame_number,
-                                    confidence=0.0,  # Not applicable for "left" event
-                                    bounding_box=tracked_obj.positions[-1] if tracked_obj.positions else BoundingBox(x=0, y=0, width=0, height=0),
-                                    dwell_time_seconds=dwell_time,
-                                    model_info=model_info
-                                )
-                                events.append(event)
-                                
-                                logger.info(f"Camera {camera_id}: Object {tracked_obj.class_name} left (track_id={track_id}, dwell_time={dwell_time:.1f}s)")
-                            
-                            # Clean up
-                            del self.active_tracks[track_id]
-                            del self.lost_tracks[track_id]
+                    logger.info(f"Camera {camera_id}: Object {class_name} left (track_id={track_id}, dwell_time={dwell_time:.1f}s)")
+                
+                # Clean up
+                tracks.release(slot)
             
             return events
             
@@ -268,13 +402,13 @@ class ObjectDetector:
     def get_active_tracks_summary(self) -> Dict[str, int]:
         """Get summary of currently tracked objects."""
         summary = {}
-        for tracked_obj in self.active_tracks.values():
-            class_name = tracked_obj.class_name
+        for class_name in self.tracks.active_class_names():
             summary[class_name] = summary.get(class_name, 0) + 1
         return summary
     
     def reset_tracking(self):
         """Reset all tracking state."""
-        self.active_tracks.clear()
-        self.lost_tracks.clear()
+        self.tracks.clear()
+        if self.tracker is not None:
+            self.tracker.reset()
         logger.info("Tracking state reset")
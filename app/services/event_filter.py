@@ -6,12 +6,17 @@ Note: Object detection now uses tracking-based filtering (ByteTrack) instead of
 """
 
 import time
-from typing import Dict, Optional, Set
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
 from app.models.event_models import MotionEvent, ANPREvent, TrackingEvent
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Upper bound on remembered "entered" track IDs per camera. Tracks whose "left"
+# event never arrives (tracker reset, restart) are evicted oldest first.
+MAX_EMITTED_TRACK_IDS = 10000
+
 
 class EventFilter:
     """
@@ -47,12 +52,14 @@ class EventFilter:
         self.motion_cooldown = motion_cooldown
         self.anpr_cooldown = anpr_cooldown
         
-        # Track last event times
-        self.last_motion_time: float = 0
+        # Track last event times (time.monotonic(), immune to wall-clock jumps).
+        # -inf means "never", since the monotonic clock may start near zero.
+        self.last_motion_time: float = float('-inf')
         self.last_anpr_times: Dict[str, float] = {}  # plate -> timestamp
+        self._anpr_order: Deque[Tuple[float, str]] = deque()  # (timestamp, plate), oldest first
         
         # Track ID deduplication - only emit events for track_id changes
-        self.emitted_track_ids: Set[int] = set()  # Track IDs that have already emitted "entered" events
+        self.emitted_track_ids: "OrderedDict[int, None]" = OrderedDict()  # Track IDs that have already emitted "entered" events, oldest first
         
         logger.info(f"EventFilter initialized for camera {camera_id} (motion_cooldown={motion_cooldown}s, anpr_cooldown={anpr_cooldown}s)")
     
@@ -66,7 +73,7 @@ class EventFilter:
         Returns:
             True if event should be published, False otherwise
         """
-        current_time = time.time()
+        current_time = time.monotonic()
         time_since_last = current_time - self.last_motion_time
         
         # Check cooldown period
@@ -90,11 +97,11 @@ class EventFilter:
         Returns:
             True if event should be published, False otherwise
         """
-        current_time = time.time()
+        current_time = time.monotonic()
         plate = event.anpr_result.license_plate
         
         # Check if we've seen this plate recently
-        last_time = self.last_anpr_times.get(plate, 0)
+        last_time = self.last_anpr_times.get(plate, float('-inf'))
         time_since_last = current_time - last_time
         
         # Check cooldown period
@@ -104,6 +111,7 @@ class EventFilter:
         
         logger.info(f"Camera {self.camera_id}: ANPR event for plate '{plate}' passed cooldown - publishing")
         self.last_anpr_times[plate] = current_time
+        self._anpr_order.append((current_time, plate))
         
         # Clean up old plates to prevent memory growth
         self._cleanup_old_anpr_entries(current_time)
@@ -133,7 +141,9 @@ class EventFilter:
                 return False
             
             # Mark this track_id as having emitted an "entered" event
-            self.emitted_track_ids.add(track_id)
+            self.emitted_track_ids[track_id] = None
+            if len(self.emitted_track_ids) > MAX_EMITTED_TRACK_IDS:
+                self.emitted_track_ids.popitem(last=False)
             logger.info(f"Camera {self.camera_id}: Tracking event 'entered' for {event.class_name} (track_id={track_id}) - publishing")
             return True
             
@@ -144,7 +154,7 @@ class EventFilter:
                 return False
             
             # Remove from emitted set since object has left
-            self.emitted_track_ids.discard(track_id)
+            del self.emitted_track_ids[track_id]
             logger.info(f"Camera {self.camera_id}: Tracking event 'left' for {event.class_name} (track_id={track_id}) - publishing")
             return True
             
@@ -162,24 +172,27 @@ class EventFilter:
         Remove old ANPR entries to prevent memory growth.
         
         Args:
-            current_time: Current timestamp
+            current_time: Current time.monotonic() value
             max_age: Maximum age in seconds to keep entries (default 5 minutes)
         """
-        plates_to_remove = [
-            plate for plate, timestamp in self.last_anpr_times.items()
-            if current_time - timestamp > max_age
-        ]
-        
-        for plate in plates_to_remove:
-            del self.last_anpr_times[plate]
-        
-        if plates_to_remove:
-            logger.debug(f"Camera {self.camera_id}: Cleaned up {len(plates_to_remove)} old ANPR entries")
+        removed = 0
+        
+        # Entries are appended in time order, so only the expired head is visited
+        while self._anpr_order and current_time - self._anpr_order[0][0] > max_age:
+            timestamp, plate = self._anpr_order.popleft()
+            # Skip entries superseded by a newer sighting of the same plate
+            if self.last_anpr_times.get(plate) == timestamp:
+                del self.last_anpr_times[plate]
+                removed += 1
+        
+        if removed:
+            logger.debug(f"Camera {self.camera_id}: Cleaned up {removed} old ANPR entries")
     
     def reset(self):
         """Reset all filter state."""
-        self.last_motion_time = 0
+        self.last_motion_time = float('-inf')
         self.last_anpr_times.clear()
+        self._anpr_order.clear()
         self.emitted_track_ids.clear()
         logger.info(f"Camera {self.camera_id}: Event filter reset")
 
@@ -0,0 +1,213 @@
+"""
+Background writer that batches event inserts and their Redis publishes.
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import insert
+
+from app.models.db_models import EventRecord
+from app.core.redis_client import redis_client, serialize_event
+from app.core.cache import bump_version, push_latest_events, EVENTS_VERSION_KEY
+from app.core.database import get_db_context
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# A batch is written once it holds this many events...
+MAX_BATCH_SIZE = 500
+# ...or this many seconds after its first event arrived
+FLUSH_INTERVAL_SECONDS = 0.1
+# Events waiting to be written; camera workers block when the writer falls this far behind
+MAX_PENDING_EVENTS = 10000
+
+# Built once at import so every batch reuses the same statement object and hits
+# SQLAlchemy's compiled cache. The page size keeps a full batch in one multi-row
+# INSERT regardless of the engine-wide insertmanyvalues default.
+_INSERT_EVENTS = insert(EventRecord).returning(
+    EventRecord.id, EventRecord.created_at, sort_by_parameter_order=True
+).execution_options(insertmanyvalues_page_size=MAX_BATCH_SIZE)
+
+
+def publish_events(events: List[Dict[str, Any]]):
+    """
+    Publish saved events to Redis.
+    
+    Each payload is serialized once; the same bytes go to Pub/Sub (one
+    pipelined round trip) and to the latest-events ring, followed by a
+    single cache version bump.
+    
+    Args:
+        events: Event payloads, in the order they were saved
+    """
+    if not events:
+        return
+    try:
+        payloads = [serialize_event(event) for event in events]
+    except Exception as e:
+        # The rows are saved; only the Redis copies are lost, so still invalidate cached listings
+        logger.error(f"Failed to serialize {len(events)} events for Redis: {e}", exc_info=True)
+        bump_version(EVENTS_VERSION_KEY)
+        return
+    try:
+        num_subscribers = redis_client.publish_events_batch(payloads)
+        logger.debug(f"Published {len(events)} events to Redis Pub/Sub (deliveries: {num_subscribers})")
+    except Exception as redis_e:
+        logger.error(f"Failed to publish {len(events)} events to Redis: {redis_e}", exc_info=True)
+    push_latest_events(payloads)
+    bump_version(EVENTS_VERSION_KEY)
+
+
+class EventWriter:
+    """
+    Single background thread persisting events for every camera.
+    
+    Camera workers hand events over with `submit`; the writer collects them
+    for up to FLUSH_INTERVAL_SECONDS (or MAX_BATCH_SIZE events), stores the
+    batch with one multi-row INSERT and one commit, then publishes the whole
+    batch to Redis with the database IDs filled in.
+    """
+    
+    def __init__(self):
+        """Initialize the event writer (the thread starts on first use)."""
+        self._queue: "queue.Queue[Dict[str, Any] | None]" = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+        self._lock = threading.Lock()
+        self.thread = None
+    
+    def start(self):
+        """Start the writer thread if it is not already running."""
+        with self._lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+            self.thread.start()
+            logger.info("EventWriter started")
+    
+    def stop(self, timeout: float = 10.0):
+        """
+        Write all pending events and stop the writer thread.
+        
+        Args:
+            timeout: Seconds to wait for pending events to be written
+        """
+        with self._lock:
+            if not self.thread or not self.thread.is_alive():
+                return
+            self._queue.put(None)
+            self.thread.join(timeout=timeout)
+            if self.thread.is_alive():
+                logger.warning("EventWriter thread did not stop within timeout")
+            else:
+                logger.info("EventWriter stopped")
+            self.thread = None
+    
+    def submit(self, row: Dict[str, Any]):
+        """
+        Queue an event for the next batch.
+        
+        Args:
+            row: EventRecord column values, with `timestamp` as an ISO string
+        """
+        # Also replaces a writer thread that has died, so queued events keep draining
+        if self.thread is None or not self.thread.is_alive():
+            self.start()
+        self._queue.put(row)
+    
+    def _run(self):
+        """Writer loop: gather a batch, write it, repeat until stopped."""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            
+            batch = [first]
+            deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+            while len(batch) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # Keep the writer alive; one bad batch must not stop every later event
+                logger.error(f"Failed to write batch of {len(batch)} events: {e}", exc_info=True)
+    
+    def _insert(self, rows: List[Dict[str, Any]]) -> List[Tuple[int, datetime]]:
+        """
+        Insert events in one statement and commit.
+        
+        Args:
+            rows: Queued event rows
+            
+        Returns:
+            (id, created_at) of each inserted row, in the order given
+        """
+        params = [
+            {**row, "timestamp": datetime.fromisoformat(row["timestamp"].replace('Z', '+00:00'))}
+            for row in rows
+        ]
+        with get_db_context() as db:
+            inserted = db.execute(_INSERT_EVENTS, params).all()
+            db.commit()
+        return inserted
+    
+    def _save_batch(self, batch: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Tuple[int, datetime]]]:
+        """
+        Save a batch, falling back to one insert per event if the batch fails.
+        
+        The batch insert is retried once (covering transient errors such as a
+        dropped connection). If it still fails, each event is inserted on its
+        own so that one bad event only loses itself, not the whole batch.
+        
+        Args:
+            batch: Queued event rows
+            
+        Returns:
+            (row, (id, created_at)) for every event that was saved
+        """
+        for attempt in range(2):
+            try:
+                inserted = self._insert(batch)
+                logger.debug(f"Saved {len(batch)} events to database in one batch")
+                return list(zip(batch, inserted))
+            except Exception as e:
+                logger.warning(f"Failed to save batch of {len(batch)} events (attempt {attempt + 1}): {e}")
+        
+        logger.error(f"Batch insert of {len(batch)} events failed twice, saving events one by one")
+        saved = []
+        for row in batch:
+            try:
+                saved.append((row, self._insert([row])[0]))
+            except Exception as e:
+                logger.error(f"Failed to save {row.get('event_type')} event for camera {row.get('camera_id')}: {e}", exc_info=True)
+        return saved
+    
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        """
+        Insert a batch of events in one statement and publish them.
+        
+        Args:
+            batch: Queued event rows
+        """
+        saved = self._save_batch(batch)
+        publish_events([
+            {"id": event_id, **row, "created_at": created_at.isoformat()}
+            for row, (event_id, created_at) in saved
+        ])
+
+
+# Global event writer instance
+event_writer = EventWriter()
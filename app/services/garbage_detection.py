@@ -1,29 +1,15 @@
-from ultralytics import YOLO
 import numpy as np
-import torch
 from typing import List, Optional, Union
 from app.core.config import get_settings
 from app.models.event_models import Detection, BoundingBox, DetectionEvent, TrackingEvent, ModelInfo
+from app.services.motion import MotionGate
+from app.services.yolo_runner import get_yolo_runner
 from app.utils.logger import get_logger
 from datetime import datetime
 
 logger = get_logger(__name__)
 settings = get_settings()
 
-# Fix for PyTorch 2.6+ weights_only security change
-# Monkey patch torch.load to use weights_only=False for trusted ultralytics models
-# This is safe because we only load official YOLOv8 models from ultralytics
-_original_torch_load = torch.load
-
-def _patched_torch_load(*args, **kwargs):
-    """Patched torch.load that sets weights_only=False for compatibility with YOLO models."""
-    if 'weights_only' not in kwargs:
-        kwargs['weights_only'] = False
-    return _original_torch_load(*args, **kwargs)
-
-torch.load = _patched_torch_load
-logger.debug("Patched torch.load for garbage detection YOLO model compatibility")
-
 # Garbage class names that should be treated as garbage
 # These include the original classes and new model classes
 GARBAGE_CLASS_NAMES = [
@@ -34,15 +20,21 @@ GARBAGE_CLASS_NAMES = [
 # Normalized class name to use in events (all garbage classes map to "Garbage")
 GARBAGE_EVENT_CLASS_NAME = "Garbage"
 
+# Lowercased garbage class names, for O(1) case-insensitive lookups
+_GARBAGE_CLASS_NAMES_LOWER = frozenset(name.lower() for name in GARBAGE_CLASS_NAMES)
+
+# Model info attached to every garbage event (immutable, so shared)
+GARBAGE_MODEL_INFO = ModelInfo(model_type="garbage_detection", version="1.0.0")
+
 
 def is_garbage_class(class_name: str) -> bool:
     """Check if a class name should be treated as garbage."""
-    return class_name.lower() in [name.lower() for name in GARBAGE_CLASS_NAMES]
+    return class_name.lower() in _GARBAGE_CLASS_NAMES_LOWER
 
 
 def normalize_garbage_class_name(class_name: str) -> str:
     """Normalize garbage class name to standard "Garbage" for events."""
-    if is_garbage_class(class_name):
+    if class_name.lower() in _GARBAGE_CLASS_NAMES_LOWER:
         return GARBAGE_EVENT_CLASS_NAME
     return class_name
 
@@ -63,7 +55,10 @@ class GarbageDetector:
         enable_tracking: bool = False,
         track_buffer_frames: int = 30,
         min_dwell_time_seconds: float = 1.0,
-        tracking_confidence_threshold: float = 0.3
+        tracking_confidence_threshold: float = 0.3,
+        motion_gate_threshold: float = 0.0,
+        motion_gate_hold_frames: int = 15,
+        motion_gate_track_stride: int = 5
     ):
         """
         Initialize garbage detection model.
@@ -74,10 +69,18 @@ class GarbageDetector:
             track_buffer_frames: Frames to wait before considering object "left"
             min_dwell_time_seconds: Minimum dwell time to trigger "left" event
             tracking_confidence_threshold: Confidence threshold for tracking
+            motion_gate_threshold: Skip inference while the motion score stays below this (0 disables gating)
+            motion_gate_hold_frames: Frames to keep running inference after the last motion
+            motion_gate_track_stride: While gated with garbage still tracked, run inference every Nth frame
         """
         self.model_path = model_path or settings.garbage_model
+        self.runner = None
         self.model = None
+        self._names_list: List[str] = []
+        self._is_garbage = np.zeros(0, dtype=bool)  # Indexed by class ID
+        self._garbage_class_ids = np.empty(0, dtype=np.int64)
         self.enable_tracking = enable_tracking
+        self.motion_gate = MotionGate(motion_gate_threshold, motion_gate_hold_frames, motion_gate_track_stride)
         
         # Initialize tracker if tracking is enabled
         self.tracker = None
@@ -89,7 +92,10 @@ class GarbageDetector:
                     enable_tracking=True,
                     track_buffer_frames=track_buffer_frames,
                     min_dwell_time_seconds=min_dwell_time_seconds,
-                    tracking_confidence_threshold=tracking_confidence_threshold
+                    tracking_confidence_threshold=tracking_confidence_threshold,
+                    motion_gate_threshold=motion_gate_threshold,
+                    motion_gate_hold_frames=motion_gate_hold_frames,
+                    motion_gate_track_stride=motion_gate_track_stride
                 )
                 logger.info("GarbageDetector initialized with tracking enabled")
             except ImportError as e:
@@ -102,10 +108,16 @@ class GarbageDetector:
         self._load_model()
     
     def _load_model(self):
-        """Load garbage detection YOLO model."""
+        """Get the shared batched runner for the garbage model (loaded once per process)."""
         try:
             logger.info(f"Loading garbage detection YOLO model: {self.model_path}")
-            self.model = YOLO(self.model_path)
+            self.runner = get_yolo_runner(self.model_path)
+            self.model = self.runner.model
+            
+            # Class names and garbage class IDs, resolved once instead of per detection
+            self._names_list = [self.model.names.get(i, str(i)) for i in range(max(self.model.names) + 1)]
+            self._is_garbage = np.array([is_garbage_class(name) for name in self._names_list], dtype=bool)
+            self._garbage_class_ids = np.flatnonzero(self._is_garbage)
             
             # Debug model information
             logger.info(f"Model info - task: {getattr(self.model, 'task', 'unknown')}")
@@ -122,7 +134,8 @@ class GarbageDetector:
         frame: np.ndarray,
         camera_id: str,
         frame_number: int,
-        confidence_threshold: float = 0.5
+        confidence_threshold: float = 0.5,
+        motion_score: Optional[float] = None
     ) -> Union[Optional[DetectionEvent], List[TrackingEvent]]:
         """
         Perform garbage detection on frame.
@@ -132,6 +145,7 @@ class GarbageDetector:
             camera_id: Camera identifier
             frame_number: Frame number
             confidence_threshold: Minimum confidence threshold
+            motion_score: Recent motion score of the scene, used for motion gating (None disables it)
             
         Returns:
             DetectionEvent object if garbage detected (detection mode), 
@@ -141,75 +155,50 @@ class GarbageDetector:
         try:
             # Use tracker if tracking is enabled
             if self.enable_tracking and self.tracker is not None:
-                return self.tracker.detect(frame, camera_id, frame_number, confidence_threshold)
+                return self.tracker.detect(frame, camera_id, frame_number, confidence_threshold, motion_score)
             
-            # Detection-only mode
-            results = self.model(frame, verbose=False)
+            # Static scene: nothing new can have appeared, skip inference
+            if self.motion_gate.should_skip(frame_number, motion_score, has_tracks=False):
+                return None
             
-            detections = []
+            # Detection-only mode, run as part of a cross-camera batch
+            result = self.runner.predict(frame, classes=self._garbage_class_ids.tolist())
             
-            # Process results
-            for result in results:
-                boxes = result.boxes
+            # Copy all boxes to the host at once: x1, y1, x2, y2, confidence, class
+            data = result.boxes.data.cpu().numpy()
+            class_ids = data[:, 5].astype(np.int64)
+            
+            # Filter by confidence and keep garbage classes only
+            mask = (data[:, 4] >= confidence_threshold) & self._is_garbage[class_ids]
+            
+            # Normalize all boxes at once: xyxy pixels -> x, y, width, height
+            h, w = result.orig_shape  # Size of the (possibly downscaled) frame the boxes refer to
+            boxes = data[mask, :4] / np.array([w, h, w, h], dtype=data.dtype)
+            boxes[:, 2:] -= boxes[:, :2]
+            
+            detections = []
+            for (x, y, width, height), confidence, class_id in zip(boxes.tolist(), data[mask, 4].tolist(), class_ids[mask].tolist()):
+                class_name = self._names_list[class_id]
                 
-                if len(boxes) == 0:
-                    continue
+                # Create detection with the class name normalized to "Garbage" for events
+                # (values come straight from the model, so skip validation)
+                detection = Detection.model_construct(
+                    class_name=GARBAGE_EVENT_CLASS_NAME,
+                    confidence=confidence,
+                    bounding_box=BoundingBox.model_construct(x=x, y=y, width=width, height=height),
+                    track_id=None  # No tracking for detection-only approach
+                )
+                detections.append(detection)
                 
-                for i in range(len(boxes)):
-                    confidence = float(boxes.conf[i])
-                    
-                    # Filter by confidence
-                    if confidence < confidence_threshold:
-                        continue
-                    
-                    # Get class name
-                    class_id = int(boxes.cls[i])
-                    class_name = self.model.names[class_id]
-                    
-                    # Only process garbage detections
-                    if not is_garbage_class(class_name):
-                        continue
-                    
-                    # Normalize class name to "Garbage" for events
-                    normalized_class_name = normalize_garbage_class_name(class_name)
-                    
-                    # Get bounding box (xyxy format)
-                    box = boxes.xyxy[i].cpu().numpy()
-                    
-                    # Normalize coordinates
-                    h, w = frame.shape[:2]
-                    x1, y1, x2, y2 = box
-                    
-                    bbox = BoundingBox(
-                        x=float(x1 / w),
-                        y=float(y1 / h),
-                        width=float((x2 - x1) / w),
-                        height=float((y2 - y1) / h)
-                    )
-                    
-                    # Create detection with normalized class name
-                    detection = Detection(
-                        class_name=normalized_class_name,
-                        confidence=confidence,
-                        bounding_box=bbox,
-                        track_id=None  # No tracking for detection-only approach
-                    )
-                    detections.append(detection)
-                    
-                    logger.info(f"Camera {camera_id}: Garbage {class_name} detected (mapped to {normalized_class_name}, confidence={confidence:.2f})")
+                logger.info(f"Camera {camera_id}: Garbage {class_name} detected (mapped to {GARBAGE_EVENT_CLASS_NAME}, confidence={confidence:.2f})")
             
             # Return DetectionEvent if any garbage was detected
             if detections:
-                model_info = ModelInfo(
-                    model_type="garbage_detection",
-                    version="1.0.0"
-                )
-                
-                event = DetectionEvent(
+                event = DetectionEvent.model_construct(
                     camera_id=camera_id,
                     detections=detections,
                     frame_number=frame_number,
-                    model_info=model_info
+                    model_info=GARBAGE_MODEL_INFO
                 )
                 return event
             
@@ -1,51 +1,22 @@
-from ultralytics import YOLO
+from collections import OrderedDict, deque
+
 import numpy as np
-import torch
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict
 import supervision as sv
 from app.core.config import get_settings
-from app.models.event_models import Detection, BoundingBox, TrackingEvent, ModelInfo
+from app.models.event_models import Detection, BoundingBox, TrackingEvent
+from app.services.garbage_detection import GARBAGE_MODEL_INFO, is_garbage_class, normalize_garbage_class_name
+from app.services.motion import MotionGate
+from app.services.yolo_runner import get_yolo_runner, to_detections
 from app.utils.logger import get_logger
 from datetime import datetime
 
 logger = get_logger(__name__)
 settings = get_settings()
 
-# Fix for PyTorch 2.6+ weights_only security change
-# Monkey patch torch.load to use weights_only=False for trusted ultralytics models
-# This is safe because we only load official YOLOv8 models from ultralytics
-_original_torch_load = torch.load
-
-def _patched_torch_load(*args, **kwargs):
-    """Patched torch.load that sets weights_only=False for compatibility with YOLO models."""
-    if 'weights_only' not in kwargs:
-        kwargs['weights_only'] = False
-    return _original_torch_load(*args, **kwargs)
-
-torch.load = _patched_torch_load
-logger.debug("Patched torch.load for garbage tracking YOLO model compatibility")
-
-# Garbage class names that should be treated as garbage
-# These include the original classes and new model classes
-GARBAGE_CLASS_NAMES = [
-    'garbage', 'trash', 'litter', 'waste',
-    'not recyclable', 'food waste'
-]
-
-# Normalized class name to use in events (all garbage classes map to "Garbage")
-GARBAGE_EVENT_CLASS_NAME = "Garbage"
-
-
-def is_garbage_class(class_name: str) -> bool:
-    """Check if a class name should be treated as garbage."""
-    return class_name.lower() in [name.lower() for name in GARBAGE_CLASS_NAMES]
-
-
-def normalize_garbage_class_name(class_name: str) -> str:
-    """Normalize garbage class name to standard "Garbage" for events."""
-    if is_garbage_class(class_name):
-        return GARBAGE_EVENT_CLASS_NAME
-    return class_name
+# History kept per tracked object, so long-dwelling objects use bounded memory
+MAX_TRACK_POSITIONS = 64
+MAX_TRACK_CONFIDENCES = 256
 
 
 class TrackedGarbage:
@@ -57,23 +28,27 @@ class TrackedGarbage:
         self.first_seen_frame = frame_number
         self.last_seen_frame = frame_number
         self.frame_count = 1
-        self.positions = []  # For trajectory tracking
-        self.confidences = []  # Track confidence over time
+        self.positions = deque(maxlen=MAX_TRACK_POSITIONS)  # Recent trajectory
+        self.confidences = deque(maxlen=MAX_TRACK_CONFIDENCES)  # Recent confidences
+        self._confidence_sum = 0.0  # Running sum of self.confidences
     
     def update(self, frame_number: int, bbox: BoundingBox, confidence: float):
         """Update track with new detection."""
         self.last_seen_frame = frame_number
         self.frame_count += 1
         self.positions.append(bbox)
+        if len(self.confidences) == self.confidences.maxlen:
+            self._confidence_sum -= self.confidences[0]
         self.confidences.append(confidence)
+        self._confidence_sum += confidence
     
     def get_dwell_time(self, fps: float = 30.0) -> float:
         """Calculate dwell time in seconds."""
         return (self.last_seen_frame - self.first_seen_frame) / fps
     
     def get_average_confidence(self) -> float:
-        """Get average confidence across all detections."""
-        return sum(self.confidences) / len(self.confidences) if self.confidences else 0.0
+        """Get average confidence over the most recent detections."""
+        return self._confidence_sum / len(self.confidences) if self.confidences else 0.0
     
     def __repr__(self):
         return f"TrackedGarbage(id={self.track_id}, class={self.class_name}, frames={self.frame_count})"
@@ -93,7 +68,10 @@ class GarbageTracker:
         enable_tracking: bool = True,
         track_buffer_frames: int = 30,
         min_dwell_time_seconds: float = 1.0,
-        tracking_confidence_threshold: float = 0.3
+        tracking_confidence_threshold: float = 0.3,
+        motion_gate_threshold: float = 0.0,
+        motion_gate_hold_frames: int = 15,
+        motion_gate_track_stride: int = 5
     ):
         """
         Initialize garbage detection model with tracking.
@@ -104,17 +82,28 @@ class GarbageTracker:
             track_buffer_frames: Frames to wait before considering object "left"
             min_dwell_time_seconds: Minimum dwell time to trigger "left" event
             tracking_confidence_threshold: Confidence threshold for tracking
+            motion_gate_threshold: Skip inference while the motion score stays below this (0 disables gating)
+            motion_gate_hold_frames: Frames to keep running inference after the last motion
+            motion_gate_track_stride: While gated with garbage still tracked, run inference every Nth frame
         """
         self.model_path = model_path or settings.garbage_model
         self.enable_tracking = enable_tracking
         self.track_buffer_frames = track_buffer_frames
         self.min_dwell_time_seconds = min_dwell_time_seconds
         self.tracking_confidence_threshold = tracking_confidence_threshold
+        self.runner = None
         self.model = None
+        self._names_list: List[str] = []
+        self._event_class_names: List[str] = []  # Class names as reported in events ("Garbage")
+        self._is_garbage = np.zeros(0, dtype=bool)  # Indexed by class ID
+        self._garbage_class_ids = np.empty(0, dtype=np.int64)
         
         # Tracking state
         self.active_tracks: Dict[int, TrackedGarbage] = {}
-        self.lost_tracks: Dict[int, Tuple[TrackedGarbage, int]] = {}  # track_id -> (object, frames_since_seen)
+        # track_id -> detect() call on which it was last seen, stalest first
+        self._last_seen: "OrderedDict[int, int]" = OrderedDict()
+        self._calls = 0  # detect() calls so far; lost-track timeouts are measured in calls
+        self.motion_gate = MotionGate(motion_gate_threshold, motion_gate_hold_frames, motion_gate_track_stride)
         
         # Initialize ByteTrack tracker from supervision
         if self.enable_tracking:
@@ -126,10 +115,17 @@ class GarbageTracker:
         self._load_model()
     
     def _load_model(self):
-        """Load garbage detection YOLO model."""
+        """Get the shared batched runner for the garbage model (loaded once per process)."""
         try:
             logger.info(f"Loading garbage detection YOLO model with tracking: {self.model_path}")
-            self.model = YOLO(self.model_path)
+            self.runner = get_yolo_runner(self.model_path)
+            self.model = self.runner.model
+            
+            # Class names and garbage class IDs, resolved once instead of every frame
+            self._names_list = [self.model.names.get(i, str(i)) for i in range(max(self.model.names) + 1)]
+            self._is_garbage = np.array([is_garbage_class(name) for name in self._names_list], dtype=bool)
+            self._garbage_class_ids = np.flatnonzero(self._is_garbage)
+            self._event_class_names = [normalize_garbage_class_name(name) for name in self._names_list]
             
             # Debug model information
             logger.info(f"Model info - task: {getattr(self.model, 'task', 'unknown')}")
@@ -146,7 +142,8 @@ class GarbageTracker:
         frame: np.ndarray,
         camera_id: str,
         frame_number: int,
-        confidence_threshold: float = 0.5
+        confidence_threshold: float = 0.5,
+        motion_score: Optional[float] = None
     ) -> List[TrackingEvent]:
         """
         Perform garbage detection with tracking.
@@ -160,73 +157,69 @@ class GarbageTracker:
             camera_id: Camera identifier
             frame_number: Frame number
             confidence_threshold: Minimum confidence threshold for detection
+            motion_score: Recent motion score of the scene, used for motion gating (None disables it)
             
         Returns:
             List of TrackingEvent objects (empty list if no events)
         """
         try:
             events = []
+            self._calls += 1
             
-            # Run inference (detection only)
-            results = self.model(frame, verbose=False)
+            # Static scene: skip inference. Skipped calls still count towards
+            # lost-track timeouts, so departures are reported on time.
+            if self.motion_gate.should_skip(frame_number, motion_score, len(self.active_tracks) > 0):
+                return events
             
-            # Convert YOLO results to supervision format
-            detections = sv.Detections.from_ultralytics(results[0])
+            # Run inference (detection only) as part of a cross-camera batch
+            garbage_class_ids = self._garbage_class_ids
+            result = self.runner.predict(frame, classes=garbage_class_ids.tolist() if len(garbage_class_ids) else None)
+            
+            # Convert YOLO results to supervision format (one device-to-host copy)
+            detections = to_detections(result)
             
             # Filter by confidence threshold
             detections = detections[detections.confidence >= confidence_threshold]
             
             # Filter for garbage classes only
-            garbage_class_ids = []
-            for class_id, class_name in self.model.names.items():
-                if is_garbage_class(class_name):
-                    garbage_class_ids.append(class_id)
-            
-            if garbage_class_ids:
+            if len(garbage_class_ids):
                 # Filter detections to only include garbage classes
-                garbage_mask = np.isin(detections.class_id, garbage_class_ids)
-                detections = detections[garbage_mask]
+                detections = detections[self._is_garbage[detections.class_id]]
             
             # Apply tracking if enabled
             if self.enable_tracking and self.tracker is not None and len(detections) > 0:
                 # Update tracker with new detections
                 detections = self.tracker.update_with_detections(detections)
             
-            current_frame_tracks = set()
+            # Only tracked detections (with an ID) produce events
+            if not self.enable_tracking or detections.tracker_id is None:
+                detections = detections[np.zeros(len(detections), dtype=bool)]
+            
+            # Normalize all boxes at once: xyxy pixels -> x, y, width, height
+            h, w = result.orig_shape  # Size of the (possibly downscaled) frame the boxes refer to
+            xyxy = np.asarray(detections.xyxy, dtype=np.float32)
+            boxes = np.empty_like(xyxy)
+            boxes[:, :2] = xyxy[:, :2]
+            boxes[:, 2:] = xyxy[:, 2:] - xyxy[:, :2]
+            boxes *= np.array([1.0 / w, 1.0 / h, 1.0 / w, 1.0 / h], dtype=np.float32)
+            
+            confidences = detections.confidence.tolist()
+            class_ids = detections.class_id.tolist()
+            track_ids = detections.tracker_id.tolist() if detections.tracker_id is not None else []
             
             # Process tracked detections
-            for i in range(len(detections)):
-                confidence = float(detections.confidence[i])
-                class_id = int(detections.class_id[i])
-                class_name = self.model.names[class_id]
-                
-                # Normalize class name to "Garbage" for events
-                normalized_class_name = normalize_garbage_class_name(class_name)
-                
-                # Get tracking ID (only available with tracking enabled)
-                track_id = None
-                if self.enable_tracking and detections.tracker_id is not None and len(detections.tracker_id) > i:
-                    track_id = int(detections.tracker_id[i])
+            for box, confidence, class_id, track_id in zip(boxes.tolist(), confidences, class_ids, track_ids):
+                class_name = self._names_list[class_id]
                 
-                if track_id is None:
-                    # No tracking ID available, skip
-                    continue
+                # Class name normalized to "Garbage" for events
+                normalized_class_name = self._event_class_names[class_id]
                 
-                current_frame_tracks.add(track_id)
+                # Move the track to the fresh end so stale tracks stay at the front
+                self._last_seen[track_id] = self._calls
+                self._last_seen.move_to_end(track_id)
                 
-                # Get bounding box (xyxy format)
-                box = detections.xyxy[i]
-                
-                # Normalize coordinates
-                h, w = frame.shape[:2]
-                x1, y1, x2, y2 = box
-                
-                bbox = BoundingBox(
-                    x=float(x1 / w),
-                    y=float(y1 / h),
-                    width=float((x2 - x1) / w),
-                    height=float((y2 - y1) / h)
-                )
+                # Values come straight from the model, so skip validation
+                bbox = BoundingBox.model_construct(x=box[0], y=box[1], width=box[2], height=box[3])
                 
                 # Check if this is a new track
                 if track_id not in self.active_tracks:
@@ -236,14 +229,8 @@ class GarbageTracker:
                     tracked_obj.update(frame_number, bbox, confidence)
                     self.active_tracks[track_id] = tracked_obj
                     
-                    # Create model info
-                    model_info = ModelInfo(
-                        model_type="garbage_detection",
-                        version="1.0.0"
-                    )
-                    
                     # Generate entry event with normalized class name
-                    event = TrackingEvent(
+                    event = TrackingEvent.model_construct(
                         camera_id=camera_id,
                         track_id=track_id,
                         tracking_action="entered",
@@ -251,7 +238,7 @@ class GarbageTracker:
                         frame_number=frame_number,
                         confidence=confidence,
                         bounding_box=bbox,
-                        model_info=model_info
+                        model_info=GARBAGE_MODEL_INFO
                     )
                     events.append(event)
                     
@@ -259,59 +246,41 @@ class GarbageTracker:
                 else:
                     # Update existing track
                     self.active_tracks[track_id].update(frame_number, bbox, confidence)
-                    
-                    # Remove from lost tracks if it was there
-                    if track_id in self.lost_tracks:
-                        del self.lost_tracks[track_id]
             
-            # Check for objects that are no longer detected
-            for track_id in list(self.active_tracks.keys()):
-                if track_id not in current_frame_tracks:
-                    # Object not in current frame
-                    tracked_obj = self.active_tracks[track_id]
+            # Expire objects that have gone unseen for too long. Tracks are ordered by last
+            # sighting, so only the expired ones at the front are visited.
+            while self._last_seen:
+                track_id, last_seen = next(iter(self._last_seen.items()))
+                
+                # Missing since the call after its last sighting; stop at the first track still within the buffer
+                if self._calls - (last_seen + 1) <= self.track_buffer_frames:
+                    break
+                
+                self._last_seen.popitem(last=False)
+                tracked_obj = self.active_tracks.pop(track_id)
+                
+                # GARBAGE OBJECT LEFT
+                dwell_time = tracked_obj.get_dwell_time()
+                
+                # Only generate event if object was present long enough
+                if dwell_time >= self.min_dwell_time_seconds:
+                    # Use average confidence for "left" event
+                    avg_confidence = tracked_obj.get_average_confidence()
+                    
+                    event = TrackingEvent.model_construct(
+                        camera_id=camera_id,
+                        track_id=track_id,
+                        tracking_action="left",
+                        class_name=tracked_obj.class_name,
+                        frame_number=frame_number,
+                        confidence=avg_confidence,
+                        bounding_box=tracked_obj.positions[-1] if tracked_obj.positions else BoundingBox(x=0, y=0, width=0, height=0),
+                        dwell_time_seconds=dwell_time,
+                        model_info=GARBAGE_MODEL_INFO
+                    )
+                    events.append(event)
                     
-                    if track_id not in self.lost_tracks:
-                        # First frame where object is missing
-                        self.lost_tracks[track_id] = (tracked_obj, 0)
-                    else:
-                        # Increment frames since last seen
-                        obj, frames_lost = self.lost_tracks[track_id]
-                        self.lost_tracks[track_id] = (obj, frames_lost + 1)
-                        
-                        # Check if object should be considered "left"
-                        if frames_lost >= self.track_buffer_frames:
-                            # GARBAGE OBJECT LEFT
-                            dwell_time = tracked_obj.get_dwell_time()
-                            
-                            # Only generate event if object was present long enough
-                            if dwell_time >= self.min_dwell_time_seconds:
-                                # Create model info
-                                model_info = ModelInfo(
-                                    model_type="garbage_detection",
-                                    version="1.0.0"
-                                )
-                                
-                                # Use average confidence for "left" event
-                                avg_confidence = tracked_obj.get_average_confidence()
-                                
-                                event = TrackingEvent(
-                                    camera_id=camera_id,
-                                    track_id=track_id,
-                                    tracking_action="left",
-                                    class_name=tracked_obj.class_name,
-                                    frame_number=frame_number,
-                                    confidence=avg_confidence,
-                                    bounding_box=tracked_obj.positions[-1] if tracked_obj.positions else BoundingBox(x=0, y=0, width=0, height=0),
-                                    dwell_time_seconds=dwell_time,
-                                    model_info=model_info
-                                )
-                                events.append(event)
-                                
-                                logger.info(f"Camera {camera_id}: Garbage {tracked_obj.class_name} left (track_id={track_id}, dwell_time={dwell_time:.1f}s)")
-                            
-                            # Clean up
-                            del self.active_tracks[track_id]
-                            del self.lost_tracks[track_id]
+                    logger.info(f"Camera {camera_id}: Garbage {tracked_obj.class_name} left (track_id={track_id}, dwell_time={dwell_time:.1f}s)")
             
             return events
             
@@ -330,7 +299,7 @@ class GarbageTracker:
     def reset_tracking(self):
         """Reset all tracking state."""
         self.active_tracks.clear()
-        self.lost_tracks.clear()
+        self._last_seen.clear()
         if self.tracker is not None:
             self.tracker.reset()
         logger.info("Garbage tracking state reset")
@@ -1,24 +1,163 @@
 import cv2
 import numpy as np
-from typing import Optional
+from typing import Optional, Tuple
+from app.core.config import get_settings
 from app.models.event_models import MotionEvent
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
+settings = get_settings()
+
+# Frames are analysed at this fraction of their size; motion is a coarse
+# signal and doesn't need full-resolution detail
+MOTION_SCALE = 0.5
+
+# Box blur applied at the reduced size to suppress sensor noise
+MOTION_BLUR_KSIZE = (5, 5)
+
+
+def _cuda_available() -> bool:
+    """Check whether this OpenCV build can run on a CUDA device."""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        # Stock opencv-python wheels are built without the cuda module
+        return False
+
+
+class MotionGate:
+    """
+    Decides when a detector can skip inference because the scene is static.
+    
+    Inference runs on every frame with motion and for hold_frames afterwards.
+    Once the scene is still, it stops entirely if nothing is tracked, or drops
+    to every track_stride-th frame so that stationary objects keep their
+    tracks and departures are still noticed.
+    """
+    
+    def __init__(self, threshold: float = 0.0, hold_frames: int = 15, track_stride: int = 5):
+        """
+        Initialize motion gate.
+        
+        Args:
+            threshold: Skip inference while the motion score stays below this (0 disables gating)
+            hold_frames: Frames to keep running inference after the last motion
+            track_stride: While gated with objects still tracked, run inference every Nth frame
+        """
+        self.threshold = threshold
+        self.hold_frames = hold_frames
+        self.track_stride = track_stride
+        self._last_motion_frame = 0
+        self._last_inference_frame = 0
+    
+    def should_skip(self, frame_number: int, motion_score: Optional[float], has_tracks: bool) -> bool:
+        """
+        Decide whether a frame can skip inference, recording it if it runs.
+        
+        Args:
+            frame_number: Frame number
+            motion_score: Motion score of the scene, or None if unknown
+            has_tracks: Whether the detector is still tracking objects
+            
+        Returns:
+            True if this frame's inference can be skipped
+        """
+        skip = self._should_skip(frame_number, motion_score, has_tracks)
+        if not skip:
+            self._last_inference_frame = frame_number
+        return skip
+    
+    def _should_skip(self, frame_number: int, motion_score: Optional[float], has_tracks: bool) -> bool:
+        """Gate decision for one frame (see class docstring)."""
+        if motion_score is None or self.threshold <= 0:
+            return False
+        if motion_score >= self.threshold:
+            self._last_motion_frame = frame_number
+            return False
+        if frame_number - self._last_motion_frame <= self.hold_frames:
+            return False
+        if not has_tracks:
+            return True
+        return frame_number - self._last_inference_frame < self.track_stride
 
 
 class MotionDetector:
-    """Motion detection service using frame differencing."""
+    """Motion detection service using MOG2 background subtraction."""
     
     def __init__(self):
         """Initialize motion detector."""
-        self.prev_frame = None
-        self.motion_mask = None  # Store last motion mask for snapshot
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
-            history=500,
-            varThreshold=16,
-            detectShadows=False
-        )
+        self._motion_mask = None  # Last foreground mask (ndarray, or GpuMat on CUDA) for snapshot, at reduced size
+        self._frame_size: Optional[Tuple[int, int]] = None  # (width, height) of the last frame
+        self._frames_seen = 0
+        self.motion_score: Optional[float] = None  # Foreground fraction of the last frame
+        
+        # With CUDA, the frame is uploaded once and every stage runs on the GPU
+        self.use_gpu = _cuda_available() if settings.motion_gpu is None else settings.motion_gpu
+        if self.use_gpu:
+            self._gpu_frame = cv2.cuda_GpuMat()
+            self._gpu_blur = cv2.cuda.createBoxFilter(cv2.CV_8UC1, cv2.CV_8UC1, MOTION_BLUR_KSIZE)
+            self._gpu_stream = cv2.cuda.Stream_Null()
+        self.background_subtractor = self._create_background_subtractor()
+    
+    def _create_background_subtractor(self):
+        """Create a fresh MOG2 background model (the CUDA implementation when running on GPU)."""
+        factory = cv2.cuda.createBackgroundSubtractorMOG2 if self.use_gpu else cv2.createBackgroundSubtractorMOG2
+        return factory(history=500, varThreshold=16, detectShadows=False)
+    
+    @property
+    def motion_mask(self) -> Optional[np.ndarray]:
+        """Motion mask of the last frame at full frame size, built only when asked for."""
+        mask = self._motion_mask
+        if mask is None:
+            return None
+        if not isinstance(mask, np.ndarray):
+            mask = mask.download()
+        return cv2.resize(mask, self._frame_size, interpolation=cv2.INTER_NEAREST)
+    
+    def _foreground_cpu(self, frame: np.ndarray) -> Tuple[int, int]:
+        """
+        Update the background model with a frame on the CPU.
+        
+        Args:
+            frame: Input frame (numpy array)
+            
+        Returns:
+            (foreground pixels, total pixels) at the reduced size
+        """
+        # Convert to grayscale at reduced size, then smooth
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.resize(gray, None, fx=MOTION_SCALE, fy=MOTION_SCALE, interpolation=cv2.INTER_AREA)
+        gray = cv2.boxFilter(gray, -1, MOTION_BLUR_KSIZE)
+        
+        # Store foreground mask for snapshot
+        fg_mask = self.background_subtractor.apply(gray)
+        self._motion_mask = fg_mask
+        
+        return cv2.countNonZero(fg_mask), fg_mask.shape[0] * fg_mask.shape[1]
+    
+    def _foreground_gpu(self, frame: np.ndarray) -> Tuple[int, int]:
+        """
+        Update the background model with a frame on the GPU.
+        
+        Same pipeline as _foreground_cpu; only the pixel count comes back to the host.
+        
+        Args:
+            frame: Input frame (numpy array)
+            
+        Returns:
+            (foreground pixels, total pixels) at the reduced size
+        """
+        self._gpu_frame.upload(frame)
+        gray = cv2.cuda.cvtColor(self._gpu_frame, cv2.COLOR_BGR2GRAY)
+        width, height = self._frame_size
+        gray = cv2.cuda.resize(gray, (int(width * MOTION_SCALE), int(height * MOTION_SCALE)), interpolation=cv2.INTER_AREA)
+        gray = self._gpu_blur.apply(gray)
+        
+        fg_mask = self.background_subtractor.apply(gray, -1.0, self._gpu_stream)
+        self._motion_mask = fg_mask
+        
+        mask_width, mask_height = fg_mask.size()
+        return cv2.cuda.countNonZero(fg_mask), mask_width * mask_height
     
     def detect(
         self,
@@ -40,33 +179,21 @@ class MotionDetector:
             MotionEvent if motion detected, None otherwise
         """
         try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (21, 21), 0)
+            self._frame_size = (frame.shape[1], frame.shape[0])
+            motion_pixels, total_pixels = self._foreground_gpu(frame) if self.use_gpu else self._foreground_cpu(frame)
             
-            # Initialize previous frame
-            if self.prev_frame is None:
-                self.prev_frame = gray
+            # The first frame only seeds the background model
+            self._frames_seen += 1
+            if self._frames_seen == 1:
                 return None
             
-            # Compute absolute difference
-            frame_delta = cv2.absdiff(self.prev_frame, gray)
-            thresh = cv2.threshold(frame_delta, 25, 255, cv2.THRESH_BINARY)[1]
-            thresh = cv2.dilate(thresh, None, iterations=2)
-            
-            # Calculate motion metrics
-            motion_pixels = cv2.countNonZero(thresh)
-            total_pixels = thresh.shape[0] * thresh.shape[1]
+            # Calculate motion metrics: the foreground fraction is both the
+            # affected area and the intensity
             affected_area = motion_pixels / total_pixels
+            motion_intensity = affected_area
             
-            # Calculate motion intensity (normalized)
-            motion_intensity = float(np.mean(frame_delta) / 255.0)
-            
-            # Store motion mask for snapshot
-            self.motion_mask = thresh
-            
-            # Update previous frame
-            self.prev_frame = gray
+            # Score used to gate object detection
+            self.motion_score = affected_area
             
             # Return event if motion detected
             if motion_intensity >= motion_threshold or affected_area >= motion_threshold:
@@ -85,5 +212,7 @@ class MotionDetector:
     
     def reset(self):
         """Reset motion detector state."""
-        self.prev_frame = None
-
+        self.background_subtractor = self._create_background_subtractor()
+        self._motion_mask = None
+        self._frames_seen = 0
+        self.motion_score = None
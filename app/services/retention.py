@@ -2,18 +2,38 @@
 Event retention service for managing event cleanup based on camera retention policies.
 """
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Mapping, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import DateTime, String, and_, column, delete, func, select, values
 
 from app.models.db_models import EventRecord
 from app.models.event_models import CameraConfig
 from app.core.database import get_db_context
+from app.core.cache import bump_version, clear_latest_events, EVENTS_VERSION_KEY
+from app.core.config import get_settings
 from app.utils.logger import get_logger
 from app.utils.snapshot import snapshot_manager
 
 logger = get_logger(__name__)
+settings = get_settings()
+
+# Expired events deleted per statement (and per transaction)
+DELETE_BATCH_SIZE = 5000
+
+# Cameras cleaned up concurrently; each holds one pooled DB connection, so
+# this stays well below db_pool_size to leave room for the event writer and API
+MAX_CLEANUP_WORKERS = 4
+
+# Snapshot files unlinked per task, all from one directory
+SNAPSHOT_DELETE_CHUNK = 256
+
+# Events are only written by camera workers, stamped when they happen and
+# inserted moments later. A camera found empty is assumed to receive no event
+# older than its scan time minus this margin.
+LATE_EVENT_MARGIN = timedelta(hours=1)
 
 
 class RetentionService:
@@ -22,11 +42,53 @@ class RetentionService:
     def __init__(self):
         """Initialize retention service."""
         logger.info("Initializing RetentionService")
+        self.snapshot_delete_workers = settings.snapshot_delete_workers or min(32, (os.cpu_count() or 1) * 4)
+        # camera_id -> lower bound on the timestamp of its oldest event, from the last cleanup.
+        # New events are always newer, so while this bound is inside the retention
+        # window the camera has nothing to delete and its cleanup can be skipped.
+        self._earliest_event: Dict[str, datetime] = {}
+    
+    def _delete_snapshots(self, snapshot_paths: List[str]) -> int:
+        """
+        Delete snapshot files of deleted events.
+        
+        Snapshots are grouped by directory (one per camera and day) so each
+        directory is opened once per chunk of SNAPSHOT_DELETE_CHUNK files;
+        chunks are unlinked on a bounded thread pool (snapshot_delete_workers)
+        to overlap filesystem latency.
+        
+        Args:
+            snapshot_paths: Snapshot paths to delete
+            
+        Returns:
+            Number of snapshots deleted
+        """
+        if not snapshot_paths:
+            return 0
+        
+        by_dir: Dict[str, List[str]] = defaultdict(list)
+        for snapshot_path in snapshot_paths:
+            relative_dir, filename = os.path.split(snapshot_path)
+            by_dir[relative_dir].append(filename)
+        
+        chunks = [
+            (relative_dir, filenames[i:i + SNAPSHOT_DELETE_CHUNK])
+            for relative_dir, filenames in by_dir.items()
+            for i in range(0, len(filenames), SNAPSHOT_DELETE_CHUNK)
+        ]
+        workers = min(self.snapshot_delete_workers, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot-delete") as executor:
+            return sum(executor.map(lambda chunk: snapshot_manager.delete_snapshots_in_dir(*chunk), chunks))
     
     def cleanup_events_for_camera(self, camera_id: str, retention_days: int) -> Tuple[int, int]:
         """
         Clean up events for a specific camera based on retention policy.
         
+        Expired events are deleted in batches of DELETE_BATCH_SIZE, each in
+        its own short transaction, so a large backlog never holds locks for
+        long or runs into statement timeouts. Each batch's snapshot files are
+        deleted once the batch is committed.
+        
         Args:
             camera_id: Camera identifier
             retention_days: Number of days to retain events
@@ -36,62 +98,75 @@ class RetentionService:
         """
         logger.info(f"Starting cleanup for camera {camera_id} with retention_days={retention_days}")
         
-        cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
+        started_at = datetime.now(timezone.utc)
+        cutoff_date = started_at - timedelta(days=retention_days)
         deleted_events = 0
         deleted_snapshots = 0
         
+        # Oldest event known to be inside the window: nothing can have expired yet
+        earliest = self._earliest_event.get(camera_id)
+        if earliest is not None and earliest >= cutoff_date:
+            logger.info(f"No events to delete for camera {camera_id} (oldest event {earliest.isoformat()} is within retention)")
+            return 0, 0
+        
+        # DELETE ... WHERE id IN (SELECT id ... LIMIT n) RETURNING snapshot_path:
+        # one round trip per batch, returning exactly the files to remove.
+        # Built on the Core table, so the session executes it as plain SQL
+        # without ORM bulk-delete handling.
+        events = EventRecord.__table__
+        expired_batch = select(events.c.id).where(
+            and_(
+                events.c.camera_id == camera_id,
+                events.c.timestamp < cutoff_date
+            )
+        ).limit(DELETE_BATCH_SIZE)
+        delete_batch = delete(events).where(
+            events.c.id.in_(expired_batch)
+        ).returning(events.c.snapshot_path)
+        
         try:
             with get_db_context() as db:
-                # Get events to be deleted
-                events_to_delete = db.query(EventRecord).filter(
-                    and_(
-                        EventRecord.camera_id == camera_id,
-                        EventRecord.timestamp < cutoff_date
-                    )
-                ).all()
-                
-                logger.info(f"Found {len(events_to_delete)} events to delete for camera {camera_id}")
-                
-                # Delete associated snapshot files first
-                snapshot_paths = []
-                for event in events_to_delete:
-                    if event.snapshot_path:
-                        snapshot_paths.append(event.snapshot_path)
-                
-                # Delete snapshot files
-                for snapshot_path in snapshot_paths:
-                    try:
-                        if snapshot_manager.delete_snapshot(snapshot_path):
-                            deleted_snapshots += 1
-                        else:
-                            logger.warning(f"Failed to delete snapshot: {snapshot_path}")
-                    except Exception as e:
-                        logger.error(f"Error deleting snapshot {snapshot_path}: {e}")
-                
-                # Delete events from database
-                if events_to_delete:
-                    event_ids = [event.id for event in events_to_delete]
-                    deleted_count = db.query(EventRecord).filter(
-                        EventRecord.id.in_(event_ids)
-                    ).delete(synchronize_session=False)
-                    
+                while True:
+                    snapshot_paths = db.execute(delete_batch).scalars().all()
                     db.commit()
-                    deleted_events = deleted_count
+                    if not snapshot_paths:
+                        break
                     
-                    logger.info(f"Deleted {deleted_events} events and {deleted_snapshots} snapshots for camera {camera_id}")
-                else:
-                    logger.info(f"No events to delete for camera {camera_id}")
-                
-                return deleted_events, deleted_snapshots
+                    deleted_events += len(snapshot_paths)
+                    bump_version(EVENTS_VERSION_KEY)
+                    clear_latest_events()
+                    
+                    deleted_snapshots += self._delete_snapshots([path for path in snapshot_paths if path])
+                    logger.debug(f"Deleted batch of {len(snapshot_paths)} events for camera {camera_id}")
+                    
+                    if len(snapshot_paths) < DELETE_BATCH_SIZE:
+                        break
                 
+                # Remember where the oldest remaining event is, for the next run
+                earliest = db.execute(
+                    select(func.min(EventRecord.timestamp)).where(EventRecord.camera_id == camera_id)
+                ).scalar()
+                self._earliest_event[camera_id] = earliest if earliest is not None else started_at - LATE_EVENT_MARGIN
+            
+            if deleted_events:
+                logger.info(f"Deleted {deleted_events} events and {deleted_snapshots} snapshots for camera {camera_id}")
+            else:
+                logger.info(f"No events to delete for camera {camera_id}")
+            
+            return deleted_events, deleted_snapshots
+            
         except Exception as e:
-            logger.error(f"Error during cleanup for camera {camera_id}: {e}", exc_info=True)
-            return 0, 0
+            logger.error(f"Error during cleanup for camera {camera_id} after deleting {deleted_events} events: {e}", exc_info=True)
+            self._earliest_event.pop(camera_id, None)
+            return deleted_events, deleted_snapshots
     
-    def cleanup_all_cameras(self, camera_configs: Dict[str, CameraConfig]) -> Dict[str, Dict[str, int]]:
+    def cleanup_all_cameras(self, camera_configs: Mapping[str, CameraConfig]) -> Dict[str, Dict[str, int]]:
         """
         Clean up events for all cameras based on their individual retention policies.
         
+        Cameras are independent, so up to MAX_CLEANUP_WORKERS of them are
+        cleaned up at once, each with its own database session.
+        
         Args:
             camera_configs: Dictionary of camera_id -> CameraConfig
             
@@ -104,12 +179,20 @@ class RetentionService:
         total_deleted_events = 0
         total_deleted_snapshots = 0
         
+        # Forget cameras that were removed
+        for camera_id in self._earliest_event.keys() - camera_configs.keys():
+            del self._earliest_event[camera_id]
+        
+        workers = max(1, min(MAX_CLEANUP_WORKERS, len(camera_configs)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retention-cleanup") as executor:
+            futures = {
+                camera_id: executor.submit(self.cleanup_events_for_camera, camera_id, config.parameters.retention_days)
+                for camera_id, config in camera_configs.items()
+            }
+        
         for camera_id, config in camera_configs.items():
             try:
-                deleted_events, deleted_snapshots = self.cleanup_events_for_camera(
-                    camera_id, 
-                    config.parameters.retention_days
-                )
+                deleted_events, deleted_snapshots = futures[camera_id].result()
                 
                 results[camera_id] = {
                     "deleted_events": deleted_events,
@@ -133,72 +216,73 @@ class RetentionService:
         
         return results
     
-    def get_retention_stats(self, camera_configs: Dict[str, CameraConfig]) -> Dict[str, Dict]:
+    def get_retention_stats(self, camera_configs: Mapping[str, CameraConfig]) -> Dict[str, Dict]:
         """
         Get retention statistics for all cameras.
         
+        All cameras are aggregated in one query: each camera's cutoff date is
+        passed in as a VALUES row and outer-joined to its events, so counts,
+        the within-retention count and the oldest/newest timestamps come back
+        in a single round trip.
+        
         Args:
             camera_configs: Dictionary of camera_id -> CameraConfig
             
         Returns:
             Dictionary with retention statistics per camera
+            
+        Raises:
+            Exception: If the statistics query fails, so callers can tell an
+                outage apart from cameras without events
         """
         logger.info(f"Getting retention stats for {len(camera_configs)} cameras")
         
-        stats = {}
+        if not camera_configs:
+            return {}
+        
+        now = datetime.now(timezone.utc)
+        cutoff_dates = {
+            camera_id: now - timedelta(days=config.parameters.retention_days)
+            for camera_id, config in camera_configs.items()
+        }
+        policies = values(
+            column("camera_id", String),
+            column("cutoff_date", DateTime(timezone=True)),
+            name="retention_policies"
+        ).data(list(cutoff_dates.items()))
+        
+        query = select(
+            policies.c.camera_id,
+            func.count(EventRecord.id),
+            func.count(EventRecord.id).filter(EventRecord.timestamp >= policies.c.cutoff_date),
+            func.min(EventRecord.timestamp),
+            func.max(EventRecord.timestamp)
+        ).select_from(policies).outerjoin(
+            EventRecord, EventRecord.camera_id == policies.c.camera_id
+        ).group_by(policies.c.camera_id)
         
         try:
             with get_db_context() as db:
-                for camera_id, config in camera_configs.items():
-                    try:
-                        # Get total events count
-                        total_events = db.query(EventRecord).filter(
-                            EventRecord.camera_id == camera_id
-                        ).count()
-                        
-                        # Get events within retention period
-                        cutoff_date = datetime.utcnow() - timedelta(days=config.parameters.retention_days)
-                        events_within_retention = db.query(EventRecord).filter(
-                            and_(
-                                EventRecord.camera_id == camera_id,
-                                EventRecord.timestamp >= cutoff_date
-                            )
-                        ).count()
-                        
-                        # Get events outside retention period (would be deleted)
-                        events_outside_retention = total_events - events_within_retention
-                        
-                        # Get oldest and newest event timestamps
-                        oldest_event = db.query(EventRecord).filter(
-                            EventRecord.camera_id == camera_id
-                        ).order_by(EventRecord.timestamp.asc()).first()
-                        
-                        newest_event = db.query(EventRecord).filter(
-                            EventRecord.camera_id == camera_id
-                        ).order_by(EventRecord.timestamp.desc()).first()
-                        
-                        stats[camera_id] = {
-                            "retention_days": config.parameters.retention_days,
-                            "total_events": total_events,
-                            "events_within_retention": events_within_retention,
-                            "events_outside_retention": events_outside_retention,
-                            "oldest_event": oldest_event.timestamp.isoformat() if oldest_event else None,
-                            "newest_event": newest_event.timestamp.isoformat() if newest_event else None,
-                            "cutoff_date": cutoff_date.isoformat()
-                        }
-                        
-                    except Exception as e:
-                        logger.error(f"Error getting stats for camera {camera_id}: {e}", exc_info=True)
-                        stats[camera_id] = {
-                            "retention_days": config.parameters.retention_days,
-                            "error": str(e)
-                        }
-                
-                return stats
-                
+                rows = db.execute(query).all()
+            
+            stats = {}
+            for camera_id, total_events, events_within_retention, oldest_event, newest_event in rows:
+                stats[camera_id] = {
+                    "retention_days": camera_configs[camera_id].parameters.retention_days,
+                    "total_events": total_events,
+                    "events_within_retention": events_within_retention,
+                    # Events outside retention period (would be deleted)
+                    "events_outside_retention": total_events - events_within_retention,
+                    "oldest_event": oldest_event.isoformat() if oldest_event else None,
+                    "newest_event": newest_event.isoformat() if newest_event else None,
+                    "cutoff_date": cutoff_dates[camera_id].isoformat()
+                }
+            
+            return stats
+            
         except Exception as e:
             logger.error(f"Error getting retention stats: {e}", exc_info=True)
-            return {}
+            raise
     
 
 
@@ -3,9 +3,8 @@ Scheduled cleanup task for event retention.
 """
 import asyncio
 import threading
-import time
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 from app.services.retention import retention_service
 from app.services.video_worker import camera_manager
@@ -29,6 +28,10 @@ class RetentionScheduler:
         self.running = False
         self.thread = None
         self.last_cleanup = None
+        # Set by stop(); the scheduler waits on it instead of sleeping, so it wakes immediately
+        self._stop_event = threading.Event()
+        # Held while a cleanup runs, so a scheduled and a manual run never overlap
+        self._cleanup_lock = threading.Lock()
         
         logger.info(f"RetentionScheduler initialized with {cleanup_interval_hours}h interval")
     
@@ -40,6 +43,7 @@ class RetentionScheduler:
         
         logger.info("Starting RetentionScheduler")
         self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.thread.start()
         logger.info("RetentionScheduler started successfully")
@@ -52,6 +56,7 @@ class RetentionScheduler:
         
         logger.info("Stopping RetentionScheduler")
         self.running = False
+        self._stop_event.set()
         
         if self.thread:
             self.thread.join(timeout=10)
@@ -64,10 +69,12 @@ class RetentionScheduler:
         """Main scheduler loop."""
         logger.info("RetentionScheduler thread started")
         
-        # Run initial cleanup after a short delay
-        time.sleep(30)  # Wait 30 seconds for system to stabilize
+        # Run initial cleanup after a short delay (30 seconds for the system to stabilize)
+        if self._stop_event.wait(30):
+            logger.info("RetentionScheduler thread stopped")
+            return
         
-        while self.running:
+        while not self._stop_event.is_set():
             try:
                 # Check if it's time for cleanup
                 if self._should_run_cleanup():
@@ -76,12 +83,13 @@ class RetentionScheduler:
                     self.last_cleanup = datetime.utcnow()
                     logger.info("Scheduled retention cleanup completed")
                 
-                # Sleep for a shorter interval to check more frequently
-                time.sleep(300)  # Check every 5 minutes
+                # Wait a shorter interval to check more frequently
+                if self._stop_event.wait(300):  # Check every 5 minutes
+                    break
                 
             except Exception as e:
                 logger.error(f"Error in retention scheduler: {e}", exc_info=True)
-                time.sleep(60)  # Wait 1 minute before retrying
+                self._stop_event.wait(60)  # Wait 1 minute before retrying
         
         logger.info("RetentionScheduler thread stopped")
     
@@ -99,7 +107,10 @@ class RetentionScheduler:
         return time_since_last.total_seconds() >= self.cleanup_interval_seconds
     
     def _run_cleanup(self):
-        """Run the retention cleanup process."""
+        """Run the retention cleanup process, unless a cleanup is already running."""
+        if not self._cleanup_lock.acquire(blocking=False):
+            logger.warning("Retention cleanup already running, skipping scheduled run")
+            return
         try:
             # Get current camera configurations
             camera_configs = camera_manager.list_cameras()
@@ -128,16 +139,22 @@ class RetentionScheduler:
             
         except Exception as e:
             logger.error(f"Error during retention cleanup: {e}", exc_info=True)
+        finally:
+            self._cleanup_lock.release()
     
     def run_cleanup_now(self) -> Dict:
         """
         Manually trigger cleanup process.
         
         Returns:
-            Dictionary with cleanup results
+            Dictionary with cleanup results; {"skipped": True, ...} if another
+            cleanup is already running
         """
         logger.info("Manual retention cleanup triggered")
         
+        if not self._cleanup_lock.acquire(blocking=False):
+            logger.warning("Retention cleanup already running, skipping manual run")
+            return {"skipped": True, "message": "Retention cleanup already running", "results": {}}
         try:
             camera_configs = camera_manager.list_cameras()
             
@@ -166,6 +183,28 @@ class RetentionScheduler:
         except Exception as e:
             logger.error(f"Error during manual cleanup: {e}", exc_info=True)
             return {"error": str(e)}
+        finally:
+            self._cleanup_lock.release()
+    
+    def run_camera_cleanup_now(self, camera_id: str, retention_days: int) -> Optional[Tuple[int, int]]:
+        """
+        Manually trigger cleanup for one camera, unless a cleanup is already running.
+        
+        Args:
+            camera_id: Camera identifier
+            retention_days: Number of days to retain events
+            
+        Returns:
+            Tuple of (deleted_events_count, deleted_snapshots_count), or None
+            if another cleanup is already running
+        """
+        if not self._cleanup_lock.acquire(blocking=False):
+            logger.warning(f"Retention cleanup already running, skipping manual run for camera {camera_id}")
+            return None
+        try:
+            return retention_service.cleanup_events_for_camera(camera_id, retention_days)
+        finally:
+            self._cleanup_lock.release()
     
     def get_status(self) -> Dict:
         """
@@ -3,16 +3,15 @@ import threading
 import time
 import os
 from datetime import datetime
-from typing import Dict, Optional
-from app.models.event_models import CameraConfig, CameraStatus, Detection
-from app.models.db_models import EventRecord
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Set
+from app.models.event_models import BoundingBox, CameraConfig, CameraStatus, Detection
 from app.services.detection import ObjectDetector
 from app.services.motion import MotionDetector
 from app.services.anpr import ANPRDetector
 from app.services.garbage_detection import GarbageDetector
 from app.services.event_filter import EventFilter
-from app.core.redis_client import redis_client
-from app.core.database import get_db_context
+from app.services.event_writer import event_writer
 from app.utils.snapshot import snapshot_manager
 from app.utils.logger import get_logger
 
@@ -34,11 +33,14 @@ def save_and_publish_event(
     snapshot_path: Optional[str],
     event_data: dict,
     camera_name: Optional[str] = None
-) -> Optional[int]:
+) -> bool:
     """
-    Save event to database and publish to Redis Pub/Sub.
+    Queue an event to be saved to the database and published to Redis Pub/Sub.
     This ensures all events are persisted and available for real-time consumption.
     
+    The shared event writer stores queued events in batches and publishes
+    each batch, with database IDs, once it is committed.
+    
     Args:
         event_type: Type of event (detection, motion, anpr, tracking)
         camera_id: Camera identifier
@@ -49,53 +51,22 @@ def save_and_publish_event(
         camera_name: Human-readable camera name (optional)
         
     Returns:
-        Event ID from database if successful, None otherwise
+        True if the event was queued, False otherwise
     """
     try:
-        # Save to database
-        with get_db_context() as db:
-            # Convert ISO timestamp to datetime
-            timestamp_dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            
-            event_record = EventRecord(
-                event_type=event_type,
-                camera_id=camera_id,
-                camera_name=camera_name,
-                timestamp=timestamp_dt,
-                frame_number=frame_number,
-                snapshot_path=snapshot_path,
-                event_data=event_data
-            )
-            db.add(event_record)
-            db.commit()
-            db.refresh(event_record)
-            
-            event_id = event_record.id
-            logger.debug(f"Saved {event_type} event to database (ID: {event_id})")
-            
-            # Publish to Redis Pub/Sub
-            try:
-                redis_event_data = {
-                    "id": event_id,
-                    "event_type": event_type,
-                    "camera_id": camera_id,
-                    "camera_name": camera_name,
-                    "timestamp": timestamp,
-                    "frame_number": frame_number,
-                    "snapshot_path": snapshot_path,
-                    "event_data": event_data,
-                    "created_at": event_record.created_at.isoformat()
-                }
-                num_subscribers = redis_client.publish_event(redis_event_data)
-                logger.debug(f"Published {event_type} event to Redis Pub/Sub (subscribers: {num_subscribers})")
-            except Exception as redis_e:
-                logger.error(f"Failed to publish {event_type} event to Redis: {redis_e}", exc_info=True)
-            
-            return event_id
-            
+        event_writer.submit({
+            "event_type": event_type,
+            "camera_id": camera_id,
+            "camera_name": camera_name,
+            "timestamp": timestamp,
+            "frame_number": frame_number,
+            "snapshot_path": snapshot_path,
+            "event_data": event_data
+        })
+        return True
     except Exception as e:
-        logger.error(f"Failed to save and publish {event_type} event: {e}", exc_info=True)
-        return None
+        logger.error(f"Failed to queue {event_type} event: {e}", exc_info=True)
+        return False
 
 
 class CameraWorker:
@@ -146,7 +117,10 @@ class CameraWorker:
             self.object_detector = ObjectDetector(
                 enable_tracking=config.parameters.enable_object_tracking,
                 track_buffer_frames=config.parameters.track_buffer_frames,
-                min_dwell_time_seconds=config.parameters.min_dwell_time_seconds
+                min_dwell_time_seconds=config.parameters.min_dwell_time_seconds,
+                motion_gate_threshold=config.parameters.motion_gate_threshold,
+                motion_gate_hold_frames=config.parameters.motion_gate_hold_frames,
+                motion_gate_track_stride=config.parameters.motion_gate_track_stride
             )
             logger.debug(f"Camera {self.camera_id}: ObjectDetector initialized with tracking={config.parameters.enable_object_tracking}")
         
@@ -161,7 +135,10 @@ class CameraWorker:
                 enable_tracking=config.parameters.enable_garbage_tracking,
                 track_buffer_frames=config.parameters.garbage_track_buffer_frames,
                 min_dwell_time_seconds=config.parameters.garbage_min_dwell_time_seconds,
-                tracking_confidence_threshold=config.parameters.garbage_tracking_confidence_threshold
+                tracking_confidence_threshold=config.parameters.garbage_tracking_confidence_threshold,
+                motion_gate_threshold=config.parameters.motion_gate_threshold,
+                motion_gate_hold_frames=config.parameters.motion_gate_hold_frames,
+                motion_gate_track_stride=config.parameters.motion_gate_track_stride
             )
             logger.debug(f"Camera {self.camera_id}: GarbageDetector initialized with tracking={config.parameters.enable_garbage_tracking}")
         
@@ -454,6 +431,29 @@ class CameraWorker:
             except:
                 pass
     
+    def _visible_vehicle_bbox(self) -> Optional[BoundingBox]:
+        """
+        Get the normalized box enclosing every vehicle tracked in the current frame.
+        
+        Returns:
+            Union of the vehicles' latest boxes, or None if no vehicle was seen this frame
+        """
+        if not self.object_detector:
+            return None
+        boxes = [
+            box
+            for class_name, box in self.object_detector.tracks.visible_boxes(self.frame_count)
+            if class_name.lower() in VEHICLE_CLASSES
+        ]
+        if not boxes:
+            return None
+        
+        x1 = min(box.x for box in boxes)
+        y1 = min(box.y for box in boxes)
+        x2 = max(box.x + box.width for box in boxes)
+        y2 = max(box.y + box.height for box in boxes)
+        return BoundingBox(x=x1, y=y1, width=min(x2 - x1, 1.0), height=min(y2 - y1, 1.0))
+    
     def _process_frame(self, frame):
         """
         Process a single frame with all enabled detectors.
@@ -472,12 +472,17 @@ class CameraWorker:
         if self.object_detector and self.config.parameters.enable_object_detection:
             logger.debug(f"Camera {self.camera_id}: Running object detection with tracking on frame #{self.frame_count}")
             detect_start = time.time()
+            # Motion score from the previous processed frame (motion detection runs below)
+            motion_score = None
+            if self.motion_detector and self.config.parameters.enable_motion_detection:
+                motion_score = self.motion_detector.motion_score
             tracking_events = self.object_detector.detect(
                 frame=frame,
                 camera_id=self.camera_id,
                 frame_number=self.frame_count,
                 confidence_threshold=self.config.parameters.confidence_threshold,
-                target_classes=self.config.parameters.detection_classes
+                target_classes=self.config.parameters.detection_classes,
+                motion_score=motion_score
             )
             detect_time = time.time() - detect_start
             
@@ -489,9 +494,9 @@ class CameraWorker:
                         break
             
             # Also check active tracks for vehicles (vehicles already being tracked)
-            if not vehicles_detected and hasattr(self.object_detector, 'active_tracks'):
-                for track_id, tracked_obj in self.object_detector.active_tracks.items():
-                    if tracked_obj.class_name.lower() in VEHICLE_CLASSES:
+            if not vehicles_detected and self.object_detector:
+                for class_name in self.object_detector.tracks.active_class_names():
+                    if class_name.lower() in VEHICLE_CLASSES:
                         vehicles_detected = True
                         break
             
@@ -532,7 +537,7 @@ class CameraWorker:
                     }
                     
                     # Save to database and publish to Redis Pub/Sub
-                    event_id = save_and_publish_event(
+                    queued = save_and_publish_event(
                         event_type="tracking",
                         camera_id=self.camera_id,
                         timestamp=event.timestamp,
@@ -542,10 +547,10 @@ class CameraWorker:
                         camera_name=self.config.camera_name
                     )
                     
-                    if event_id:
-                        logger.info(f"Camera {self.camera_id}: Saved and published tracking event '{event.tracking_action}' for {event.class_name} (track_id={event.track_id}, event_id={event_id}) in {detect_time:.3f}s")
+                    if queued:
+                        logger.info(f"Camera {self.camera_id}: Queued tracking event '{event.tracking_action}' for {event.class_name} (track_id={event.track_id}) in {detect_time:.3f}s")
                     else:
-                        logger.error(f"Camera {self.camera_id}: Failed to save tracking event for track_id={event.track_id}")
+                        logger.error(f"Camera {self.camera_id}: Failed to queue tracking event for track_id={event.track_id}")
             else:
                 logger.debug(f"Camera {self.camera_id}: No tracking events in frame #{self.frame_count} ({detect_time:.3f}s)")
         
@@ -579,7 +584,7 @@ class CameraWorker:
                     }
                     
                     # Save to database and publish to Redis Pub/Sub
-                    event_id = save_and_publish_event(
+                    queued = save_and_publish_event(
                         event_type="motion",
                         camera_id=self.camera_id,
                         timestamp=motion_event.timestamp,
@@ -589,10 +594,10 @@ class CameraWorker:
                         camera_name=self.config.camera_name
                     )
                     
-                    if event_id:
-                        logger.info(f"Camera {self.camera_id}: Saved and published motion event for frame #{self.frame_count} (motion_intensity: {motion_event.motion_intensity:.2f}, affected_area: {motion_event.affected_area_percentage:.2f}, event_id={event_id}) in {motion_time:.3f}s")
+                    if queued:
+                        logger.info(f"Camera {self.camera_id}: Queued motion event for frame #{self.frame_count} (motion_intensity: {motion_event.motion_intensity:.2f}, affected_area: {motion_event.affected_area_percentage:.2f}) in {motion_time:.3f}s")
                     else:
-                        logger.error(f"Camera {self.camera_id}: Failed to save motion event")
+                        logger.error(f"Camera {self.camera_id}: Failed to queue motion event")
                 else:
                     logger.debug(f"Camera {self.camera_id}: Motion event filtered (cooldown) for frame #{self.frame_count}")
             else:
@@ -602,11 +607,16 @@ class CameraWorker:
         if self.garbage_detector and self.config.parameters.enable_garbage_detection:
             logger.debug(f"Camera {self.camera_id}: Running garbage detection on frame #{self.frame_count}")
             garbage_start = time.time()
+            # Motion detection has already run on this frame
+            motion_score = None
+            if self.motion_detector and self.config.parameters.enable_motion_detection:
+                motion_score = self.motion_detector.motion_score
             garbage_result = self.garbage_detector.detect(
                 frame=frame,
                 camera_id=self.camera_id,
                 frame_number=self.frame_count,
-                confidence_threshold=self.config.parameters.garbage_confidence_threshold
+                confidence_threshold=self.config.parameters.garbage_confidence_threshold,
+                motion_score=motion_score
             )
             garbage_time = time.time() - garbage_start
             
@@ -647,7 +657,7 @@ class CameraWorker:
                         }
                         
                         # Save to database and publish to Redis Pub/Sub
-                        event_id = save_and_publish_event(
+                        queued = save_and_publish_event(
                             event_type="tracking",
                             camera_id=self.camera_id,
                             timestamp=event.timestamp,
@@ -657,10 +667,10 @@ class CameraWorker:
                             camera_name=self.config.camera_name
                         )
                         
-                        if event_id:
-                            logger.info(f"Camera {self.camera_id}: Saved and published garbage tracking event '{event.tracking_action}' for {event.class_name} (track_id={event.track_id}, event_id={event_id}) in {garbage_time:.3f}s")
+                        if queued:
+                            logger.info(f"Camera {self.camera_id}: Queued garbage tracking event '{event.tracking_action}' for {event.class_name} (track_id={event.track_id}) in {garbage_time:.3f}s")
                         else:
-                            logger.error(f"Camera {self.camera_id}: Failed to save garbage tracking event for track_id={event.track_id}")
+                            logger.error(f"Camera {self.camera_id}: Failed to queue garbage tracking event for track_id={event.track_id}")
                 else:
                     # Detection mode: garbage_result is a DetectionEvent object
                     garbage_event = garbage_result
@@ -680,7 +690,7 @@ class CameraWorker:
                     }
                     
                     # Save to database and publish to Redis Pub/Sub
-                    event_id = save_and_publish_event(
+                    queued = save_and_publish_event(
                         event_type="detection",
                         camera_id=self.camera_id,
                         timestamp=garbage_event.timestamp,
@@ -690,11 +700,11 @@ class CameraWorker:
                         camera_name=self.config.camera_name
                     )
                     
-                    if event_id:
+                    if queued:
                         detection_count = len(garbage_event.detections)
-                        logger.info(f"Camera {self.camera_id}: Saved and published garbage detection event with {detection_count} detections (event_id={event_id}) in {garbage_time:.3f}s")
+                        logger.info(f"Camera {self.camera_id}: Queued garbage detection event with {detection_count} detections in {garbage_time:.3f}s")
                     else:
-                        logger.error(f"Camera {self.camera_id}: Failed to save garbage detection event")
+                        logger.error(f"Camera {self.camera_id}: Failed to queue garbage detection event")
             else:
                 logger.debug(f"Camera {self.camera_id}: No garbage detected in frame #{self.frame_count} ({garbage_time:.3f}s)")
         
@@ -706,7 +716,8 @@ class CameraWorker:
                     anpr_event = self.anpr_detector.detect(
                         frame=frame,
                         camera_id=self.camera_id,
-                        frame_number=self.frame_count
+                        frame_number=self.frame_count,
+                        vehicle_bbox=self._visible_vehicle_bbox()
                     )
                     anpr_time = time.time() - anpr_start
                 except Exception as e:
@@ -736,10 +747,10 @@ class CameraWorker:
                                 break
                 
                 # If not found in tracking events, check active tracks
-                if not vehicle_class and hasattr(self.object_detector, 'active_tracks'):
-                    for track_id, tracked_obj in self.object_detector.active_tracks.items():
-                        if tracked_obj.class_name.lower() in VEHICLE_CLASSES:
-                            vehicle_class = tracked_obj.class_name
+                if not vehicle_class and self.object_detector:
+                    for class_name in self.object_detector.tracks.active_class_names():
+                        if class_name.lower() in VEHICLE_CLASSES:
+                            vehicle_class = class_name
                             break
                 
                 # Update anpr_result with vehicle class
@@ -761,7 +772,7 @@ class CameraWorker:
                 }
                 
                 # Save to database and publish to Redis Pub/Sub
-                event_id = save_and_publish_event(
+                queued = save_and_publish_event(
                     event_type="anpr",
                     camera_id=self.camera_id,
                     timestamp=anpr_event.timestamp,
@@ -771,11 +782,11 @@ class CameraWorker:
                     camera_name=self.config.camera_name
                 )
                 
-                if event_id:
+                if queued:
                     vehicle_info = f", vehicle: {vehicle_class}" if vehicle_class else ""
-                    logger.info(f"Camera {self.camera_id}: Saved and published ANPR event for frame #{self.frame_count}: {anpr_event.anpr_result.license_plate} (confidence: {anpr_event.anpr_result.confidence:.2f}{vehicle_info}, event_id={event_id}) in {anpr_time:.3f}s")
+                    logger.info(f"Camera {self.camera_id}: Queued ANPR event for frame #{self.frame_count}: {anpr_event.anpr_result.license_plate} (confidence: {anpr_event.anpr_result.confidence:.2f}{vehicle_info}) in {anpr_time:.3f}s")
                 else:
-                    logger.error(f"Camera {self.camera_id}: Failed to save ANPR event")
+                    logger.error(f"Camera {self.camera_id}: Failed to queue ANPR event")
             else:
                 logger.debug(f"Camera {self.camera_id}: ANPR event filtered (duplicate plate in cooldown) for frame #{self.frame_count}: {anpr_event.anpr_result.license_plate}")
         
@@ -790,6 +801,10 @@ class CameraManager:
         """Initialize camera manager."""
         logger.debug("Initializing CameraManager")
         self.workers: Dict[str, CameraWorker] = {}
+        # Camera IDs whose workers are being built outside the lock
+        self.pending: Set[str] = set()
+        # Read-only snapshot returned by list_cameras(); rebuilt after add/remove
+        self._cameras_snapshot: Optional[Mapping[str, CameraConfig]] = None
         self.lock = threading.Lock()
         logger.info("CameraManager initialized successfully")
     
@@ -805,24 +820,32 @@ class CameraManager:
         """
         logger.debug(f"CameraManager: add_camera() called for {config.camera_id}")
         
+        # Reserve the ID under the lock, but build the worker (model loading,
+        # stream open) outside it so several cameras can be added concurrently
         with self.lock:
-            if config.camera_id in self.workers:
+            if config.camera_id in self.workers or config.camera_id in self.pending:
                 logger.warning(f"CameraManager: Camera {config.camera_id} already exists")
                 return False
+            self.pending.add(config.camera_id)
+        
+        try:
+            logger.debug(f"CameraManager: Creating worker for camera {config.camera_id}")
+            worker = CameraWorker(config)
             
-            try:
-                logger.debug(f"CameraManager: Creating worker for camera {config.camera_id}")
-                worker = CameraWorker(config)
-                
-                logger.debug(f"CameraManager: Starting worker for camera {config.camera_id}")
-                worker.start()
-                
+            logger.debug(f"CameraManager: Starting worker for camera {config.camera_id}")
+            worker.start()
+            
+            with self.lock:
                 self.workers[config.camera_id] = worker
+                self.pending.discard(config.camera_id)
+                self._cameras_snapshot = None
                 logger.info(f"CameraManager: Successfully added camera {config.camera_id} (total cameras: {len(self.workers)})")
-                return True
-            except Exception as e:
-                logger.error(f"CameraManager: Failed to add camera {config.camera_id}: {e}", exc_info=True)
-                return False
+            return True
+        except Exception as e:
+            with self.lock:
+                self.pending.discard(config.camera_id)
+            logger.error(f"CameraManager: Failed to add camera {config.camera_id}: {e}", exc_info=True)
+            return False
     
     def remove_camera(self, camera_id: str) -> bool:
         """
@@ -850,6 +873,7 @@ class CameraManager:
                 
                 logger.info(f"CameraManager: Deleting camera {camera_id} from workers dictionary")
                 del self.workers[camera_id]
+                self._cameras_snapshot = None
                 
                 logger.info(f"CameraManager: Successfully removed camera {camera_id} (remaining cameras: {list(self.workers.keys())})")
                 return True
@@ -878,22 +902,28 @@ class CameraManager:
                 logger.debug(f"CameraManager: Camera {camera_id} not found")
                 return None
     
-    def list_cameras(self) -> Dict[str, CameraConfig]:
+    def list_cameras(self) -> Mapping[str, CameraConfig]:
         """
         List all active cameras.
         
+        The mapping is cached until the next add/remove and is read-only, so
+        repeated calls are O(1).
+        
         Returns:
-            Dictionary of camera_id -> CameraConfig
+            Read-only mapping of camera_id -> CameraConfig
         """
-        logger.info(f"CameraManager: list_cameras() called")
+        snapshot = self._cameras_snapshot
+        if snapshot is not None:
+            return snapshot
         
         with self.lock:
-            camera_list = {
-                camera_id: worker.config
-                for camera_id, worker in self.workers.items()
-            }
-            logger.info(f"CameraManager: Returning {len(camera_list)} cameras: {list(camera_list.keys())}")
-            return camera_list
+            if self._cameras_snapshot is None:
+                self._cameras_snapshot = MappingProxyType({
+                    camera_id: worker.config
+                    for camera_id, worker in self.workers.items()
+                })
+                logger.debug(f"CameraManager: Rebuilt camera list ({len(self._cameras_snapshot)} cameras)")
+            return self._cameras_snapshot
     
     def stop_all(self):
         """Stop all camera workers."""
@@ -911,6 +941,7 @@ class CameraManager:
                     if worker:
                         worker.stop()
                         del self.workers[camera_id]
+                        self._cameras_snapshot = None
                         logger.info(f"CameraManager: Successfully stopped camera {camera_id}")
                 except Exception as e:
                     logger.error(f"CameraManager: Failed to stop camera {camera_id}: {e}", exc_info=True)
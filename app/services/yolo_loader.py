@@ -0,0 +1,265 @@
+"""
+Shared YOLO model loading with optional TensorRT (GPU) or OpenVINO INT8 (CPU) acceleration.
+"""
+import threading
+from pathlib import Path
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+from app.core.config import get_settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Inference precisions accepted by the yolo_precision setting
+SUPPORTED_PRECISIONS = ("fp32", "fp16", "int8")
+
+# Serializes exports so two cameras never build the same model at once
+_export_lock = threading.Lock()
+
+# Let float32 matmuls use TF32 tensor cores on GPUs that have them
+torch.set_float32_matmul_precision("high")
+
+
+def _patch_torch_load():
+    """
+    Make torch.load default to weights_only=False for YOLO checkpoints.
+    
+    PyTorch 2.6 changed the default to weights_only=True, which rejects
+    Ultralytics checkpoints. This is safe because we only load our own
+    YOLOv8 weights. Every YOLO model is loaded through this module, so
+    the patch lives here and is applied once per process.
+    """
+    if getattr(torch.load, "_weights_only_patched", False):
+        return
+    original_torch_load = torch.load
+    
+    def patched_torch_load(*args, **kwargs):
+        """Patched torch.load that sets weights_only=False for compatibility with YOLO models."""
+        if 'weights_only' not in kwargs:
+            kwargs['weights_only'] = False
+        return original_torch_load(*args, **kwargs)
+    
+    patched_torch_load._weights_only_patched = True
+    torch.load = patched_torch_load
+    logger.debug("Patched torch.load for YOLO model compatibility")
+
+
+_patch_torch_load()
+
+
+def _configure_cpu_threads():
+    """
+    Apply the torch_num_threads setting to PyTorch's CPU thread pools.
+    
+    PyTorch defaults to one intra-op thread per core for every forward
+    pass, so the object and garbage models running at once oversubscribe
+    the CPU. Each batched runner already parallelizes across cameras, so
+    inter-op parallelism is limited to one thread.
+    """
+    if settings.torch_num_threads <= 0:
+        return
+    torch.set_num_threads(settings.torch_num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError as e:
+        # Only allowed before PyTorch runs any parallel work
+        logger.warning(f"Could not set PyTorch inter-op threads: {e}")
+    logger.info(f"PyTorch CPU threads set to {settings.torch_num_threads}")
+
+
+_configure_cpu_threads()
+
+
+def _engine_path(model_path: str, imgsz: int, precision: str, use_gpu: bool) -> Path:
+    """
+    Get the cache location of the exported model.
+    
+    Exports are specific to the input size, precision and maximum batch
+    size they were built for, so all three are part of the name.
+    
+    Args:
+        model_path: Path to the PyTorch weights
+        imgsz: Inference image size
+        precision: "fp16" or "int8"
+        use_gpu: TensorRT engine if True, OpenVINO model directory otherwise
+    
+    Returns:
+        Path of the cached .engine file (or _openvino_model directory) next to the weights
+    """
+    weights = Path(model_path)
+    name = f"{weights.stem}-{imgsz}-{precision}-b{settings.yolo_batch_size}"
+    # Ultralytics recognizes OpenVINO models by the _openvino_model suffix
+    return weights.with_name(f"{name}.engine" if use_gpu else f"{name}_openvino_model")
+
+
+def _resolve_precision(use_gpu: bool) -> str:
+    """
+    Get the effective inference precision for this host.
+    
+    Args:
+        use_gpu: Whether a CUDA GPU is available
+    
+    Returns:
+        "fp32" when acceleration is disabled or unavailable, otherwise
+        "fp16" (CUDA hosts) or "int8" (CPU hosts, through OpenVINO)
+    """
+    precision = settings.yolo_precision.lower()
+    if precision not in SUPPORTED_PRECISIONS:
+        logger.warning(f"Unknown yolo_precision '{settings.yolo_precision}', using fp32")
+        return "fp32"
+    if precision == "fp32":
+        return precision
+    if precision == "int8" and not settings.yolo_int8_calibration_data:
+        fallback = "fp16" if use_gpu else "fp32"
+        logger.warning(f"yolo_precision=int8 needs yolo_int8_calibration_data, using {fallback}")
+        return fallback
+    if precision == "int8" and use_gpu:
+        # The pinned ultralytics release ignores int8 for TensorRT exports and would
+        # build an fp16/fp32 engine, so don't pretend to serve int8 on GPU
+        logger.warning("yolo_precision=int8 is not supported for TensorRT engines by the installed ultralytics, using fp16")
+        return "fp16"
+    if precision == "fp16" and not use_gpu:
+        logger.warning("yolo_precision=fp16 needs a CUDA GPU, using fp32")
+        return "fp32"
+    return precision
+
+
+def _export_engine(model_path: str, imgsz: int, precision: str, use_gpu: bool) -> Path:
+    """
+    Build the TensorRT engine (GPU) or OpenVINO model (CPU) unless it is already cached.
+    
+    Args:
+        model_path: Path to the PyTorch weights
+        imgsz: Inference image size
+        precision: "fp16" (TensorRT) or "int8" (OpenVINO)
+        use_gpu: Build a TensorRT engine if True, an OpenVINO model otherwise
+    
+    Returns:
+        Path of the exported model
+    """
+    engine_path = _engine_path(model_path, imgsz, precision, use_gpu)
+    backend = "TensorRT" if use_gpu else "OpenVINO"
+    with _export_lock:
+        if engine_path.exists():
+            return engine_path
+        
+        logger.info(f"Building {backend} {precision} model for {model_path} (imgsz={imgsz}), this can take several minutes")
+        export_kwargs = {
+            "format": "engine" if use_gpu else "openvino",
+            "imgsz": imgsz,
+            "half": precision == "fp16",
+            # Dynamic batch axis up to the cross-camera batch size (see yolo_runner)
+            "dynamic": True,
+            "batch": settings.yolo_batch_size,
+        }
+        if precision == "int8":
+            # Calibration images come from a dataset YAML (e.g. recent camera frames);
+            # this runs NNCF post-training quantization for OpenVINO
+            export_kwargs["int8"] = True
+            export_kwargs["data"] = settings.yolo_int8_calibration_data
+        
+        exported = Path(YOLO(model_path).export(**export_kwargs))
+        exported.replace(engine_path)
+        logger.info(f"{backend} model saved to {engine_path}")
+        return engine_path
+
+
+def _compile_eager(model: YOLO):
+    """
+    Compile a PyTorch model with torch.compile and run one warmup pass.
+    
+    Inductor fuses conv/bn/activation kernels and "reduce-overhead" replays
+    the forward pass as a CUDA graph, removing per-layer launch overhead.
+    The warmup pays the compile cost at startup rather than on the first
+    camera frame; other batch sizes compile the first time they occur.
+    Any failure leaves the model uncompiled.
+    
+    Args:
+        model: Model returned by _load_eager
+    """
+    try:
+        model.model = torch.compile(model.model, mode="reduce-overhead")
+        warmup = np.zeros((settings.yolo_imgsz, settings.yolo_imgsz, 3), dtype=np.uint8)
+        model.predict(warmup, imgsz=settings.yolo_imgsz, half=use_eager_half(model), verbose=False)
+        logger.info("Compiled YOLO model with torch.compile")
+    except Exception as e:
+        logger.error(f"torch.compile failed, running the model uncompiled: {e}", exc_info=True)
+        model.model = getattr(model.model, "_orig_mod", model.model)
+        model.predictor = None  # Rebuilt around the uncompiled model on the next predict
+
+
+def _load_eager(model_path: str) -> YOLO:
+    """
+    Load the PyTorch weights, in channels_last layout on CUDA hosts.
+    
+    channels_last (NHWC) is the layout cuDNN's tensor-core convolution
+    kernels prefer, so it saves layout conversions inside each conv.
+    With yolo_compile set, the model is also compiled (see _compile_eager).
+    
+    Args:
+        model_path: Path to the PyTorch weights
+    
+    Returns:
+        Loaded YOLO model
+    """
+    model = YOLO(model_path)
+    if torch.cuda.is_available() and isinstance(model.model, torch.nn.Module):
+        model.model.to(memory_format=torch.channels_last)
+        if settings.yolo_compile:
+            _compile_eager(model)
+    return model
+
+
+def use_eager_half(model: YOLO) -> bool:
+    """
+    Check whether a loaded model should run eager FP16 inference.
+    
+    True when an accelerated precision was requested on a CUDA host but
+    the PyTorch weights were loaded anyway (export failed), so the model
+    still gets tensor-core FP16 instead of silently running FP32.
+    
+    Args:
+        model: Model returned by load_yolo
+    
+    Returns:
+        True if predict() should be called with half=True
+    """
+    return (
+        isinstance(model.model, torch.nn.Module)
+        and torch.cuda.is_available()
+        and settings.yolo_precision.lower() in ("fp16", "int8")
+    )
+
+
+def load_yolo(model_path: str) -> YOLO:
+    """
+    Load a YOLO model at the configured inference precision.
+    
+    With yolo_precision set to "fp16" on a CUDA host, the model is exported
+    once to an fp16 TensorRT engine (cached next to the weights) and the
+    engine is loaded instead; "int8" falls back to fp16 there. On CPU-only
+    hosts, "int8" exports an INT8 OpenVINO model instead. `.predict()` and `.track()` work unchanged.
+    Any export failure falls back to the PyTorch weights.
+    
+    Args:
+        model_path: Path to the PyTorch weights
+    
+    Returns:
+        Loaded YOLO model
+    """
+    use_gpu = torch.cuda.is_available()
+    precision = _resolve_precision(use_gpu)
+    if precision == "fp32":
+        return _load_eager(model_path)
+    
+    try:
+        engine_path = _export_engine(model_path, settings.yolo_imgsz, precision, use_gpu)
+        logger.info(f"Loading {precision} model: {engine_path}")
+        return YOLO(str(engine_path), task="detect")
+    except Exception as e:
+        logger.error(f"Model export failed for {model_path}, using PyTorch weights: {e}", exc_info=True)
+        return _load_eager(model_path)
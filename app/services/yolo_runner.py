@@ -0,0 +1,202 @@
+"""
+Cross-camera batched YOLO inference.
+
+Every camera worker runs in its own thread. Instead of each one launching
+its own forward pass, frames submitted within a short window are stacked
+into one batch and run through a single shared model, then handed back to
+their cameras. Tracking stays per camera (see ObjectDetector).
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from app.core.config import get_settings
+from app.services.yolo_loader import load_yolo, use_eager_half
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Detection floor for batched inference. Matches Ultralytics' default for
+# model.track() so ByteTrack still sees low-score boxes for association;
+# each camera applies its own confidence threshold afterwards.
+BATCH_CONFIDENCE_FLOOR = 0.1
+
+_runner_lock = threading.Lock()
+
+
+def _downscale(frame: np.ndarray, imgsz: int) -> np.ndarray:
+    """
+    Shrink a frame so its longer side is imgsz, keeping the aspect ratio.
+    
+    Ultralytics letterboxes every frame to imgsz anyway; doing the resize
+    here, in the camera's own thread, keeps the dispatcher thread's
+    preprocessing down to padding a small image. Smaller frames are
+    returned unchanged.
+    
+    Args:
+        frame: Input frame (numpy array)
+        imgsz: Inference image size
+    
+    Returns:
+        The downscaled frame, or the original if it already fits
+    """
+    h, w = frame.shape[:2]
+    scale = imgsz / max(h, w)
+    if scale >= 1.0:
+        return frame
+    return cv2.resize(frame, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_LINEAR)
+
+
+def to_detections(result) -> sv.Detections:
+    """
+    Convert an Ultralytics result to supervision Detections with one device copy.
+    
+    `sv.Detections.from_ultralytics` copies xyxy, conf and cls to the host
+    separately (one CUDA sync each). The boxes' packed data tensor
+    (x1, y1, x2, y2, conf, cls) holds all three, so it is copied once and
+    sliced on the host instead.
+    
+    Args:
+        result: Ultralytics Results for one frame
+        
+    Returns:
+        Detections with xyxy, confidence and class_id set
+    """
+    data = result.boxes.data.cpu().numpy()
+    return sv.Detections(
+        xyxy=data[:, :4].astype(np.float32, copy=False),
+        confidence=data[:, 4].astype(np.float32, copy=False),
+        class_id=data[:, 5].astype(np.int64)
+    )
+
+
+class BatchedYOLORunner:
+    """Runs one YOLO model for many threads, batching their frames together."""
+    
+    def __init__(self, model_path: str, max_batch_size: int, max_wait_seconds: float):
+        """
+        Load the model and start the dispatcher thread.
+        
+        Args:
+            model_path: Path to YOLO model file
+            max_batch_size: Maximum number of frames per forward pass
+            max_wait_seconds: How long the first frame of a batch waits for others
+        """
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.model = load_yolo(model_path)
+        self.half = use_eager_half(self.model)
+        
+        self._queue: "queue.Queue[Tuple[np.ndarray, Optional[Sequence[int]], Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"yolo-batch-{model_path}", daemon=True)
+        self._thread.start()
+        logger.info(f"Batched YOLO runner started for {model_path} (max_batch_size={max_batch_size}, max_wait={max_wait_seconds * 1000:.1f}ms)")
+    
+    def predict(self, frame: np.ndarray, classes: Optional[Sequence[int]] = None):
+        """
+        Run detection on a frame as part of the next batch.
+        
+        Blocks the calling camera thread until its batch has been processed.
+        Frames larger than the inference size are downscaled first, so box
+        coordinates refer to the result's orig_shape, not the input frame.
+        
+        Args:
+            frame: Input frame (numpy array)
+            classes: Class IDs the caller needs, or None for all classes. The
+                batch is filtered to the union of its callers' classes, so
+                results may still contain other classes.
+        
+        Returns:
+            Ultralytics Results for this frame
+        
+        Raises:
+            TimeoutError: If the batch is not done within yolo_predict_timeout_seconds
+        """
+        future: Future = Future()
+        self._queue.put((_downscale(frame, settings.yolo_imgsz), classes, future))
+        try:
+            return future.result(timeout=settings.yolo_predict_timeout_seconds)
+        except FutureTimeoutError:
+            # A stalled forward pass must not hang every camera on this model;
+            # the dispatcher resolves the abandoned future whenever it finishes
+            logger.error(f"YOLO inference for {self.model_path} did not finish within {settings.yolo_predict_timeout_seconds}s")
+            raise TimeoutError(f"YOLO inference timed out after {settings.yolo_predict_timeout_seconds}s")
+    
+    def _run(self):
+        """Dispatcher loop: gather frames into a batch, run it, return results."""
+        while True:
+            batch = [self._queue.get()]
+            
+            # Wait briefly for frames from other cameras to fill the batch
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._run_batch(batch)
+    
+    def _run_batch(self, batch: List[Tuple[np.ndarray, Optional[Sequence[int]], Future]]):
+        """
+        Run one forward pass over a batch and resolve each caller's future.
+        
+        Args:
+            batch: (frame, classes, future) tuples in submission order
+        """
+        frames = [frame for frame, _, _ in batch]
+        
+        # Let NMS drop classes no camera in this batch asked for
+        classes = None
+        if all(wanted is not None for _, wanted, _ in batch):
+            classes = sorted(set().union(*(wanted for _, wanted, _ in batch)))
+        
+        try:
+            results = self.model.predict(
+                frames, imgsz=settings.yolo_imgsz, conf=BATCH_CONFIDENCE_FLOOR, classes=classes, half=self.half, verbose=False
+            )
+        except Exception as e:
+            logger.error(f"Batched YOLO inference failed for {len(frames)} frames: {e}", exc_info=True)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+@lru_cache(maxsize=None)
+def _create_runner(model_path: str) -> BatchedYOLORunner:
+    """Create the runner for a model; cached so every camera shares it."""
+    return BatchedYOLORunner(
+        model_path,
+        max_batch_size=settings.yolo_batch_size,
+        max_wait_seconds=settings.yolo_batch_wait_ms / 1000.0
+    )
+
+
+def get_yolo_runner(model_path: str) -> BatchedYOLORunner:
+    """
+    Get the shared batched runner for a model, loading it on first use.
+    
+    Args:
+        model_path: Path to YOLO model file
+    
+    Returns:
+        Shared BatchedYOLORunner instance
+    """
+    # Serialize first loads so concurrent camera registrations don't load the model twice
+    with _runner_lock:
+        return _create_runner(model_path)
@@ -5,7 +5,7 @@ import cv2
 import os
 import numpy as np
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Set
 from pathlib import Path
 from app.models.event_models import Detection, BoundingBox, ANPRResult
 from app.core.config import get_settings
@@ -15,12 +15,40 @@ logger = get_logger(__name__)
 settings = get_settings()
 
 
+def _encode_params() -> List[int]:
+    """
+    Build the cv2.imwrite parameters for the configured snapshot format.
+    
+    Returns:
+        JPEG quality or PNG compression parameters (empty for other formats)
+    """
+    snapshot_format = settings.snapshot_format.lower()
+    if snapshot_format in ["jpg", "jpeg"]:
+        return [int(cv2.IMWRITE_JPEG_QUALITY), settings.snapshot_quality]
+    if snapshot_format == "png":
+        # For PNG, quality is compression level (0-9). We'll map the 0-100 scale roughly to 0-9
+        compression = int((100 - settings.snapshot_quality) / 10)
+        compression = max(0, min(9, compression))
+        return [int(cv2.IMWRITE_PNG_COMPRESSION), compression]
+    return []
+
+
+# Snapshot settings don't change at runtime; resolve them once instead of per snapshot
+_SNAPSHOTS_ENABLED = settings.enable_snapshots
+_SNAPSHOT_EXT = settings.snapshot_format.lower().replace("jpeg", "jpg") or "jpg"
+_ENCODE_PARAMS = _encode_params()
+
+
 class SnapshotManager:
     """Manager for saving event snapshots."""
     
     def __init__(self):
         """Initialize snapshot manager."""
         self.snapshots_dir = Path(settings.snapshots_dir)
+        # String form of snapshots_dir for the per-snapshot path joins
+        self._snapshots_root = str(self.snapshots_dir)
+        # camera_id/date directories already created by this process
+        self._known_dirs: Set[str] = set()
         self._ensure_directory_exists()
     
     def _ensure_directory_exists(self):
@@ -44,25 +72,17 @@ class SnapshotManager:
         Returns:
             Relative path to snapshot file
         """
-        # Create camera subdirectory
-        camera_dir = self.snapshots_dir / camera_id
-        camera_dir.mkdir(exist_ok=True)
-        
-        # Create date subdirectory (YYYY-MM-DD)
-        date_dir = camera_dir / timestamp.strftime("%Y-%m-%d")
-        date_dir.mkdir(exist_ok=True)
+        # Camera and date subdirectory (camera_id/YYYY-MM-DD), created once per day
+        relative_dir = f"{camera_id}/{timestamp.strftime('%Y-%m-%d')}"
+        if relative_dir not in self._known_dirs:
+            os.makedirs(os.path.join(self._snapshots_root, relative_dir), exist_ok=True)
+            self._known_dirs.add(relative_dir)
         
-        # Generate filename: eventtype_HHMMSS_microseconds.png
         # Generate filename: eventtype_HHMMSS_microseconds.ext
-        ext = settings.snapshot_format.lower().replace("jpeg", "jpg")
-        if not ext:
-            ext = "jpg"
-            
-        filename = f"{event_type}_{timestamp.strftime('%H%M%S')}_{timestamp.microsecond:06d}.{ext}"
-        full_path = date_dir / filename
+        filename = f"{event_type}_{timestamp.strftime('%H%M%S')}_{timestamp.microsecond:06d}.{_SNAPSHOT_EXT}"
         
         # Return relative path from snapshots_dir
-        return str(full_path.relative_to(self.snapshots_dir))
+        return f"{relative_dir}/{filename}"
     
     def _denormalize_bbox(self, bbox: BoundingBox, frame_height: int, frame_width: int) -> tuple:
         """
@@ -102,7 +122,7 @@ class SnapshotManager:
             Relative path to saved snapshot, or None if failed
         """
         try:
-            if not settings.enable_snapshots:
+            if not _SNAPSHOTS_ENABLED:
                 return None
             
             # Clone frame to avoid modifying original
@@ -154,19 +174,9 @@ class SnapshotManager:
             
             # Generate path and save
             relative_path = self._get_snapshot_path(camera_id, "detection", timestamp)
-            full_path = self.snapshots_dir / relative_path
+            full_path = os.path.join(self._snapshots_root, relative_path)
             
-            # Set compression parameters
-            encode_params = []
-            if settings.snapshot_format.lower() in ["jpg", "jpeg"]:
-                encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), settings.snapshot_quality]
-            elif settings.snapshot_format.lower() == "png":
-                # For PNG, quality is compression level (0-9). We'll map the 0-100 scale roughly to 0-9
-                compression = int((100 - settings.snapshot_quality) / 10)
-                compression = max(0, min(9, compression))
-                encode_params = [int(cv2.IMWRITE_PNG_COMPRESSION), compression]
-
-            cv2.imwrite(str(full_path), annotated_frame, encode_params)
+            cv2.imwrite(full_path, annotated_frame, _ENCODE_PARAMS)
             
             logger.debug(f"Saved detection snapshot: {relative_path}")
             return relative_path
@@ -195,7 +205,7 @@ class SnapshotManager:
             Relative path to saved snapshot, or None if failed
         """
         try:
-            if not settings.enable_snapshots:
+            if not _SNAPSHOTS_ENABLED:
                 return None
             
             annotated_frame = frame.copy()
@@ -223,19 +233,9 @@ class SnapshotManager:
             
             # Generate path and save
             relative_path = self._get_snapshot_path(camera_id, "motion", timestamp)
-            full_path = self.snapshots_dir / relative_path
+            full_path = os.path.join(self._snapshots_root, relative_path)
             
-            # Set compression parameters
-            encode_params = []
-            if settings.snapshot_format.lower() in ["jpg", "jpeg"]:
-                encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), settings.snapshot_quality]
-            elif settings.snapshot_format.lower() == "png":
-                # For PNG, quality is compression level (0-9). We'll map the 0-100 scale roughly to 0-9
-                compression = int((100 - settings.snapshot_quality) / 10)
-                compression = max(0, min(9, compression))
-                encode_params = [int(cv2.IMWRITE_PNG_COMPRESSION), compression]
-
-            cv2.imwrite(str(full_path), annotated_frame, encode_params)
+            cv2.imwrite(full_path, annotated_frame, _ENCODE_PARAMS)
             
             logger.debug(f"Saved motion snapshot: {relative_path}")
             return relative_path
@@ -266,7 +266,7 @@ class SnapshotManager:
             Relative path to saved snapshot, or None if failed
         """
         try:
-            if not settings.enable_snapshots:
+            if not _SNAPSHOTS_ENABLED:
                 return None
             
             annotated_frame = frame.copy()
@@ -294,19 +294,9 @@ class SnapshotManager:
             
             # Generate path and save
             relative_path = self._get_snapshot_path(camera_id, "anpr", timestamp)
-            full_path = self.snapshots_dir / relative_path
+            full_path = os.path.join(self._snapshots_root, relative_path)
             
-            # Set compression parameters
-            encode_params = []
-            if settings.snapshot_format.lower() in ["jpg", "jpeg"]:
-                encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), settings.snapshot_quality]
-            elif settings.snapshot_format.lower() == "png":
-                # For PNG, quality is compression level (0-9). We'll map the 0-100 scale roughly to 0-9
-                compression = int((100 - settings.snapshot_quality) / 10)
-                compression = max(0, min(9, compression))
-                encode_params = [int(cv2.IMWRITE_PNG_COMPRESSION), compression]
-
-            cv2.imwrite(str(full_path), annotated_frame, encode_params)
+            cv2.imwrite(full_path, annotated_frame, _ENCODE_PARAMS)
             
             logger.debug(f"Saved ANPR snapshot: {relative_path}")
             return relative_path
@@ -351,6 +341,46 @@ class SnapshotManager:
         except Exception as e:
             logger.error(f"Error deleting snapshot {relative_path}: {e}", exc_info=True)
             return False
+    
+    def delete_snapshots_in_dir(self, relative_dir: str, filenames: List[str]) -> int:
+        """
+        Delete several snapshot files from one directory.
+        
+        The directory is opened once and each file is unlinked relative to
+        that descriptor, so the path is resolved once per directory instead
+        of once per file (and there is no separate existence check).
+        
+        Args:
+            relative_dir: Directory relative to snapshots directory
+            filenames: Names of the files in that directory
+            
+        Returns:
+            Number of snapshots deleted
+        """
+        try:
+            dir_fd = os.open(os.path.join(self._snapshots_root, relative_dir), os.O_RDONLY | os.O_DIRECTORY)
+        except FileNotFoundError:
+            logger.warning(f"Snapshot directory not found: {relative_dir} ({len(filenames)} snapshots)")
+            return 0
+        except OSError as e:
+            logger.error(f"Error opening snapshot directory {relative_dir}: {e}")
+            return 0
+        
+        deleted = 0
+        try:
+            for filename in filenames:
+                try:
+                    os.unlink(filename, dir_fd=dir_fd)
+                    deleted += 1
+                except FileNotFoundError:
+                    logger.warning(f"Snapshot file not found: {relative_dir}/{filename}")
+                except OSError as e:
+                    logger.error(f"Error deleting snapshot {relative_dir}/{filename}: {e}")
+        finally:
+            os.close(dir_fd)
+        
+        logger.debug(f"Deleted {deleted} snapshots from {relative_dir}")
+        return deleted
 
 
 # Global snapshot manager instance
@@ -0,0 +1,16 @@
+-- Migration to add a composite index for event listing
+-- Serves list_events filters on camera_id + event_type ordered by timestamp DESC
+-- as a single index range scan instead of a bitmap heap scan + sort
+
+-- For PostgreSQL
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_camera_type_timestamp
+ON events (camera_id, event_type, timestamp DESC);
+
+-- Note: no GIN index on event_data is added here; jsonb_path_ops would only serve
+-- @> containment queries, which list_events does not issue. The class_name filter
+-- runs on the generated class_name column and its idx_class_name index
+-- (see add_generated_filter_columns_migration.sql and
+-- convert_event_data_to_jsonb_migration.sql).
+
+-- Note: The CONCURRENTLY option allows the index to be created without blocking reads/writes
+-- Remove CONCURRENTLY if your PostgreSQL version doesn't support it
@@ -0,0 +1,41 @@
+-- Migration to add generated filter columns to the events table
+-- class_name and max_confidence are derived from event_data by PostgreSQL (12+)
+-- so that the object_class and min_confidence filters become B-tree lookups
+-- instead of a per-row JSON walk
+
+-- Generated columns cannot contain subqueries, so the detections array walk
+-- lives in an IMMUTABLE function
+CREATE OR REPLACE FUNCTION events_max_confidence(data json)
+RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT GREATEST(
+        (data->>'confidence')::float,
+        (data->'anpr_result'->>'confidence')::float,
+        (
+            SELECT max((det->>'confidence')::float)
+            FROM json_array_elements(
+                CASE WHEN json_typeof(data->'detections') = 'array'
+                     THEN data->'detections' ELSE '[]'::json END
+            ) AS det
+        )
+    )
+$$;
+
+-- Note: adding a STORED generated column rewrites the table
+ALTER TABLE events ADD COLUMN IF NOT EXISTS class_name VARCHAR(100)
+    GENERATED ALWAYS AS (lower(event_data->>'class_name')) STORED;
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS max_confidence DOUBLE PRECISION
+    GENERATED ALWAYS AS (events_max_confidence(event_data)) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_class_name ON events (class_name);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_max_confidence ON events (max_confidence);
+
+-- The expression index from add_object_class_index_migration.sql is superseded by idx_class_name
+DROP INDEX CONCURRENTLY IF EXISTS idx_event_data_class_name;
+
+-- Verify the change
+SELECT column_name, data_type, is_generated
+FROM information_schema.columns
+WHERE table_name = 'events' AND column_name IN ('class_name', 'max_confidence');
@@ -0,0 +1,11 @@
+-- Migration to add a trigram index for license plate searches
+-- Plain (non-regex) license_plate filters are sent as ILIKE '%...%', which
+-- pg_trgm can answer from this index instead of scanning every ANPR event
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_license_plate_trgm
+ON events USING gin ((event_data->'anpr_result'->>'license_plate') gin_trgm_ops);
+
+-- Note: The CONCURRENTLY option allows the index to be created without blocking reads/writes
+-- Remove CONCURRENTLY if your PostgreSQL version doesn't support it
@@ -0,0 +1,15 @@
+-- Migration to add a BRIN index on events.timestamp
+-- Events are inserted in time order, so physical row order tracks timestamp
+-- and a BRIN index summarizes each block range with a handful of bytes.
+-- It serves the time-range predicates of retention cleanup, stats and the
+-- start_time/end_time filters at a fraction of a B-tree's size and write cost.
+
+-- For PostgreSQL
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_ts_brin
+ON events USING brin (timestamp) WITH (pages_per_range = 32);
+
+-- Note: The B-tree indexes on timestamp are kept. BRIN cannot return rows in
+-- order, and list_events relies on them for ORDER BY timestamp DESC LIMIT n.
+
+-- Note: The CONCURRENTLY option allows the index to be created without blocking reads/writes
+-- Remove CONCURRENTLY if your PostgreSQL version doesn't support it
@@ -0,0 +1,51 @@
+-- Migration to store events.event_data as jsonb instead of json
+-- jsonb is parsed once on write, so reads and the ->/->> lookups used by the
+-- filters and generated columns no longer re-parse the text on every row
+
+-- The generated columns depend on event_data, which blocks changing its type,
+-- so they are dropped (with their indexes) and recreated on top of jsonb.
+-- Note: this rewrites the table; run it during a maintenance window
+BEGIN;
+
+ALTER TABLE events DROP COLUMN IF EXISTS class_name;
+ALTER TABLE events DROP COLUMN IF EXISTS max_confidence;
+DROP FUNCTION IF EXISTS events_max_confidence(json);
+
+ALTER TABLE events ALTER COLUMN event_data TYPE jsonb USING event_data::jsonb;
+
+CREATE OR REPLACE FUNCTION events_max_confidence(data jsonb)
+RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+    SELECT GREATEST(
+        (data->>'confidence')::float,
+        (data->'anpr_result'->>'confidence')::float,
+        (
+            SELECT max((det->>'confidence')::float)
+            FROM jsonb_array_elements(
+                CASE WHEN jsonb_typeof(data->'detections') = 'array'
+                     THEN data->'detections' ELSE '[]'::jsonb END
+            ) AS det
+        )
+    )
+$$;
+
+ALTER TABLE events ADD COLUMN class_name VARCHAR(100)
+    GENERATED ALWAYS AS (lower(event_data->>'class_name')) STORED;
+
+ALTER TABLE events ADD COLUMN max_confidence DOUBLE PRECISION
+    GENERATED ALWAYS AS (events_max_confidence(event_data)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_class_name ON events (class_name);
+CREATE INDEX IF NOT EXISTS idx_max_confidence ON events (max_confidence);
+
+COMMIT;
+
+-- Note: idx_license_plate_trgm (add_license_plate_trgm_index_migration.sql) is
+-- rebuilt automatically by the type change; ->> yields text for jsonb as well.
+-- No GIN index on the whole document is added: no query uses @> containment.
+
+-- Verify the change
+SELECT column_name, data_type, is_generated
+FROM information_schema.columns
+WHERE table_name = 'events' AND column_name IN ('event_data', 'class_name', 'max_confidence');
@@ -0,0 +1,21 @@
+-- Migration to store event timestamps as timestamptz
+-- Existing values were written as naive UTC, so they are interpreted AT TIME ZONE 'UTC'.
+-- Both columns get a server-side now() default, so inserts no longer need a
+-- Python-side value.
+
+-- Note: changing the column type rewrites the table and rebuilds every index
+-- that covers these columns; run it during a maintenance window
+BEGIN;
+
+ALTER TABLE events
+    ALTER COLUMN timestamp TYPE TIMESTAMPTZ USING timestamp AT TIME ZONE 'UTC',
+    ALTER COLUMN timestamp SET DEFAULT now(),
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at SET DEFAULT now();
+
+COMMIT;
+
+-- Verify the change
+SELECT column_name, data_type, column_default
+FROM information_schema.columns
+WHERE table_name = 'events' AND column_name IN ('timestamp', 'created_at');